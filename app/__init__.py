@@ -206,7 +206,12 @@ def get_default_config():
             'api_key': os.getenv('OPENAI_API_KEY'),
             'max_tokens': 2000,
             'temperature': 0.7,
-            'timeout': 60
+            'timeout': 60,
+            'semantic_cache': {
+                'enabled': os.getenv('LLM_SEMANTIC_CACHE', 'False').lower() == 'true',
+                'threshold': 0.92,
+                'ttl': 3600
+            }
         },
         'embedding': {
             'provider': 'openai',
@@ -26,8 +26,8 @@ class DocumentAgent(BaseAgent):
         # Tipi di documento supportati
         self.supported_types = ['pdf', 'docx', 'txt', 'xlsx', 'pptx']
         
-        # Inizializza collezione se non esiste
-        self._ensure_collection_exists()
+        # La collezione viene verificata al primo utilizzo, non qui: il client vettoriale resta lazy
+        self._collection_ready = False
     
     def get_capabilities(self) -> List[str]:
         """Restituisce le capacità dell'agente documenti"""
@@ -59,6 +59,7 @@ class DocumentAgent(BaseAgent):
         Returns:
             Risultati della ricerca/analisi documenti
         """
+        self._ensure_collection_exists()
         return self.execute_with_stats(self._process_document_query, query, context)
     
     def _process_document_query(self, query: str, context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
@@ -453,6 +454,8 @@ Fornisci un riassunto strutturato che evidenzi:
         Returns:
             True se aggiunto con successo
         """
+        self._ensure_collection_exists()
+        
         try:
             # Determina tipo file
             file_extension = document_path.split('.')[-1].lower()
@@ -508,6 +511,9 @@ Fornisci un riassunto strutturato che evidenzi:
     
     def _ensure_collection_exists(self):
         """Assicura che la collezione per i documenti esista"""
+        if self._collection_ready:
+            return
+        
         try:
             collections = self.vector_service.list_collections()
             
@@ -519,9 +525,12 @@ Fornisci un riassunto strutturato che evidenzi:
                 )
                 
                 if success:
+                    self._collection_ready = True
                     logger.info(f"Collezione {self.collection_name} creata con successo")
                 else:
                     logger.error(f"Errore nella creazione della collezione {self.collection_name}")
+            else:
+                self._collection_ready = True
             
         except Exception as e:
             logger.error(f"Errore nella verifica/creazione collezione documenti: {e}")
@@ -22,8 +22,8 @@ class ImageAgent(BaseAgent):
         self.similarity_threshold = config.get('similarity_threshold', 0.7)
         self.max_results = config.get('max_results', 10)
         
-        # Inizializza collezione se non esiste
-        self._ensure_collection_exists()
+        # La collezione viene verificata al primo utilizzo, non qui: il client vettoriale resta lazy
+        self._collection_ready = False
     
     def get_capabilities(self) -> List[str]:
         """Restituisce le capacità dell'agente immagini"""
@@ -55,6 +55,7 @@ class ImageAgent(BaseAgent):
         Returns:
             Risultati della ricerca/analisi immagini
         """
+        self._ensure_collection_exists()
         return self.execute_with_stats(self._process_image_query, query, context)
     
     def _process_image_query(self, query: str, context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
@@ -109,15 +110,14 @@ class ImageAgent(BaseAgent):
             if not image_path:
                 return {'success': False, 'error': 'Percorso immagine non fornito'}
             
-            # Analisi base dell'immagine
-            image_analysis = self.file_service.analyze_image(image_path)
-            if not image_analysis.get('success'):
-                return image_analysis
+            # Analisi base dell'immagine e OCR con una sola decodifica
+            processed = self.file_service.process_image(image_path)
+            if not processed.get('success'):
+                return processed
+            image_analysis = processed['analysis']
             
-            # Estrazione testo se OCR abilitato
-            ocr_result = None
-            if self.ocr_enabled:
-                ocr_result = self.file_service.extract_text_from_image(image_path)
+            # Testo estratto solo se OCR abilitato
+            ocr_result = processed['ocr'] if self.ocr_enabled else None
             
             # Generazione descrizione con GPT-5V (simulata con descrizione basata su analisi)
             description = self._generate_image_description(image_analysis, ocr_result)
@@ -438,16 +438,17 @@ Includi: tipo di contenuto, colori principali, oggetti visibili, categoria gener
         Returns:
             True se aggiunta con successo
         """
+        self._ensure_collection_exists()
+        
         try:
-            # Analisi dell'immagine
-            image_analysis = self.file_service.analyze_image(image_path)
-            if not image_analysis.get('success'):
+            # Analisi dell'immagine e OCR con una sola decodifica
+            processed = self.file_service.process_image(image_path)
+            if not processed.get('success'):
                 return False
+            image_analysis = processed['analysis']
             
-            # Estrazione testo se OCR abilitato
-            ocr_result = None
-            if self.ocr_enabled:
-                ocr_result = self.file_service.extract_text_from_image(image_path)
+            # Testo estratto solo se OCR abilitato
+            ocr_result = processed['ocr'] if self.ocr_enabled else None
             
             # Generazione descrizione
             description = self._generate_image_description(image_analysis, ocr_result)
@@ -493,6 +494,9 @@ Includi: tipo di contenuto, colori principali, oggetti visibili, categoria gener
     
     def _ensure_collection_exists(self):
         """Assicura che la collezione per le immagini esista"""
+        if self._collection_ready:
+            return
+        
         try:
             collections = self.vector_service.list_collections()
             
@@ -504,9 +508,12 @@ Includi: tipo di contenuto, colori principali, oggetti visibili, categoria gener
                 )
                 
                 if success:
+                    self._collection_ready = True
                     logger.info(f"Collezione {self.collection_name} creata con successo")
                 else:
                     logger.error(f"Errore nella creazione della collezione {self.collection_name}")
+            else:
+                self._collection_ready = True
             
         except Exception as e:
             logger.error(f"Errore nella verifica/creazione collezione immagini: {e}")
@@ -19,8 +19,8 @@ class TextAgent(BaseAgent):
         self.similarity_threshold = config.get('similarity_threshold', 0.7)
         self.max_results = config.get('max_results', 10)
         
-        # Inizializza collezione se non esiste
-        self._ensure_collection_exists()
+        # La collezione viene verificata al primo utilizzo, non qui: il client vettoriale resta lazy
+        self._collection_ready = False
     
     def get_capabilities(self) -> List[str]:
         """Restituisce le capacità dell'agente testuale"""
@@ -52,6 +52,7 @@ class TextAgent(BaseAgent):
         Returns:
             Risultati della ricerca testuale
         """
+        self._ensure_collection_exists()
         return self.execute_with_stats(self._process_text_query, query, context)
     
     def _process_text_query(self, query: str, context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
@@ -75,12 +76,8 @@ class TextAgent(BaseAgent):
             # Generazione di query alternative per migliorare i risultati
             alternative_queries = self._generate_alternative_queries(query)
             
-            # Ricerca con query alternative
-            alternative_results = []
-            for alt_query in alternative_queries:
-                alt_embedding = self.embedding_service.generate_text_embedding(alt_query)
-                alt_results = self._semantic_search(alt_embedding, query_analysis, max_results=5)
-                alternative_results.extend(alt_results)
+            # Ricerca con query alternative (embeddings e ricerca vettoriale in batch)
+            alternative_results = self._semantic_search_batch(alternative_queries, max_results=5)
             
             # Combinazione e ranking dei risultati
             all_results = semantic_results + alternative_results
@@ -129,24 +126,51 @@ class TextAgent(BaseAgent):
                 threshold=self.similarity_threshold
             )
             
-            # Conversione in formato standard
-            formatted_results = []
-            for result in search_results:
-                formatted_result = {
-                    'title': self._extract_title_from_text(result.get('text', '')),
-                    'content': result.get('text', ''),
-                    'source_type': 'database',
-                    'relevance_score': result.get('score', 0.0),
-                    'metadata': result.get('metadata', {})
-                }
-                formatted_results.append(formatted_result)
-            
-            return formatted_results[:max_results]
+            return self._format_search_results(search_results)[:max_results]
             
         except Exception as e:
             logger.error(f"Errore nella ricerca semantica: {e}")
             return []
     
+    def _semantic_search_batch(self, queries: List[str], max_results: int) -> List[Dict[str, Any]]:
+        """Esegue la ricerca semantica per più query con un solo batch di embeddings e di ricerca"""
+        if not queries:
+            return []
+        
+        try:
+            embeddings = self.embedding_service.generate_batch_embeddings(queries)
+            
+            batch_results = self.vector_service.search_vectors_batch(
+                collection_name=self.collection_name,
+                query_vectors=embeddings,
+                top_k=max_results * 2,
+                threshold=self.similarity_threshold
+            )
+            
+            results = []
+            for search_results in batch_results:
+                results.extend(self._format_search_results(search_results)[:max_results])
+            return results
+            
+        except Exception as e:
+            logger.error(f"Errore nella ricerca semantica batch: {e}")
+            return []
+    
+    def _format_search_results(self, search_results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Converte i risultati del database vettoriale nel formato standard"""
+        formatted_results = []
+        for result in search_results:
+            formatted_result = {
+                'title': self._extract_title_from_text(result.get('text', '')),
+                'content': result.get('text', ''),
+                'source_type': 'database',
+                'relevance_score': result.get('score', 0.0),
+                'metadata': result.get('metadata', {})
+            }
+            formatted_results.append(formatted_result)
+        
+        return formatted_results
+    
     def _generate_alternative_queries(self, original_query: str) -> List[str]:
         """Genera query alternative per migliorare la ricerca"""
         try:
@@ -172,14 +196,16 @@ class TextAgent(BaseAgent):
                 seen_content.add(content_hash)
                 unique_results.append(result)
         
-        # Ri-valutazione della rilevanza con LLM
-        for result in unique_results:
-            try:
-                relevance_score = self.llm_service.evaluate_result_relevance(query, result)
+        # Ri-valutazione della rilevanza con LLM (una chiamata per blocco di risultati)
+        try:
+            relevance_scores = self.llm_service.evaluate_results_relevance(query, unique_results)
+            for result, relevance_score in zip(unique_results, relevance_scores):
                 result['llm_relevance_score'] = relevance_score
                 # Combina score semantico e LLM
                 result['combined_score'] = (result.get('relevance_score', 0) + relevance_score) / 2
-            except:
+        except Exception as e:
+            logger.warning(f"Valutazione LLM della rilevanza non disponibile: {e}")
+            for result in unique_results:
                 result['combined_score'] = result.get('relevance_score', 0)
         
         # Ordinamento per score combinato
@@ -247,6 +273,8 @@ Fornisci un riassunto conciso (massimo 200 parole) che evidenzi le informazioni
         Returns:
             True se aggiunto con successo
         """
+        self._ensure_collection_exists()
+        
         try:
             # Chunking del testo se necessario
             if len(text) > 1000:
@@ -298,6 +326,8 @@ Fornisci un riassunto conciso (massimo 200 parole) che evidenzi le informazioni
         Returns:
             Lista di risultati
         """
+        self._ensure_collection_exists()
+        
         try:
             # Genera embedding per la query
             query_embedding = self.embedding_service.generate_text_embedding(query)
@@ -318,6 +348,9 @@ Fornisci un riassunto conciso (massimo 200 parole) che evidenzi le informazioni
     
     def _ensure_collection_exists(self):
         """Assicura che la collezione per i testi esista"""
+        if self._collection_ready:
+            return
+        
         try:
             # Verifica se la collezione esiste
             collections = self.vector_service.list_collections()
@@ -331,9 +364,12 @@ Fornisci un riassunto conciso (massimo 200 parole) che evidenzi le informazioni
                 )
                 
                 if success:
+                    self._collection_ready = True
                     logger.info(f"Collezione {self.collection_name} creata con successo")
                 else:
                     logger.error(f"Errore nella creazione della collezione {self.collection_name}")
+            else:
+                self._collection_ready = True
             
         except Exception as e:
             logger.error(f"Errore nella verifica/creazione collezione: {e}")
@@ -34,8 +34,8 @@ class WebAgent(BaseAgent):
             'Connection': 'keep-alive',
         }
         
-        # Inizializza collezione se non esiste
-        self._ensure_collection_exists()
+        # La collezione viene verificata al primo utilizzo, non qui: il client vettoriale resta lazy
+        self._collection_ready = False
     
     def get_capabilities(self) -> List[str]:
         """Restituisce le capacità dell'agente web"""
@@ -69,6 +69,7 @@ class WebAgent(BaseAgent):
         Returns:
             Risultati della ricerca web
         """
+        self._ensure_collection_exists()
         return self.execute_with_stats(self._process_web_query, query, context)
     
     def _process_web_query(self, query: str, context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
@@ -566,6 +567,9 @@ Fornisci un'analisi che includa:
     
     def _ensure_collection_exists(self):
         """Assicura che la collezione per contenuti web esista"""
+        if self._collection_ready:
+            return
+        
         try:
             collections = self.vector_service.list_collections()
             
@@ -577,9 +581,12 @@ Fornisci un'analisi che includa:
                 )
                 
                 if success:
+                    self._collection_ready = True
                     logger.info(f"Collezione {self.collection_name} creata con successo")
                 else:
                     logger.error(f"Errore nella creazione della collezione {self.collection_name}")
+            else:
+                self._collection_ready = True
             
         except Exception as e:
             logger.error(f"Errore nella verifica/creazione collezione web: {e}")
@@ -4,15 +4,21 @@ API Routes per Deep Search AI
 
 import logging
 import asyncio
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, request, jsonify, current_app, Response, stream_with_context
 from werkzeug.utils import secure_filename
 from functools import wraps
 import time
+import json
 
 from .search_controller import SearchController
+from app.services.file_service import MAGIC_PREFIX_SIZE, FileService
+from app.services.llm_service import close_async_clients
 
 logger = logging.getLogger(__name__)
 
+# Margine per intestazioni multipart e campi di form oltre al file stesso
+MULTIPART_OVERHEAD = 64 * 1024
+
 # Crea blueprint per le API
 api_bp = Blueprint('api', __name__, url_prefix='/api/v1')
 
@@ -25,9 +31,35 @@ def async_route(f):
         try:
             return loop.run_until_complete(f(*args, **kwargs))
         finally:
+            # I client asincroni creati su questo loop vanno chiusi con lui
+            loop.run_until_complete(close_async_clients())
             loop.close()
     return wrapper
 
+def stream_async_events(async_gen):
+    """
+    Converte un generatore asincrono di testo in eventi Server-Sent Events
+    
+    Il generatore viene consumato su un event loop dedicato alla risposta,
+    inoltrando ogni frammento appena disponibile.
+    """
+    loop = asyncio.new_event_loop()
+    try:
+        while True:
+            try:
+                delta = loop.run_until_complete(async_gen.__anext__())
+            except StopAsyncIteration:
+                break
+            yield f"data: {json.dumps({'delta': delta}, ensure_ascii=False)}\n\n"
+        yield "event: done\ndata: {}\n\n"
+    except Exception as e:
+        logger.error(f"Errore durante lo streaming: {e}")
+        yield f"event: error\ndata: {json.dumps({'error': 'Errore durante lo streaming'})}\n\n"
+    finally:
+        loop.run_until_complete(async_gen.aclose())
+        loop.run_until_complete(close_async_clients())
+        loop.close()
+
 def validate_json_request(required_fields=None):
     """Decorator per validare richieste JSON"""
     def decorator(f):
@@ -62,6 +94,43 @@ def get_search_controller():
     """Ottiene l'istanza del SearchController dall'app context"""
     return current_app.search_controller
 
+def reject_oversized_upload():
+    """
+    Rifiuta con 413 una richiesta il cui corpo supera il limite per file
+    
+    Va chiamata prima di accedere a request.files: usa il Content-Length della
+    richiesta, così il multipart non viene letto né bufferizzato. Le singole parti
+    multipart quasi mai dichiarano una propria lunghezza.
+    
+    Returns:
+        Risposta 413 oppure None se la richiesta può essere letta
+    """
+    controller = get_search_controller()
+    if controller is not None:
+        max_file_size = controller.file_service.max_file_size
+    else:
+        max_file_size = current_app.config.get('MAX_CONTENT_LENGTH')
+    
+    if (max_file_size is not None and request.content_length is not None
+            and request.content_length > max_file_size + MULTIPART_OVERHEAD):
+        return jsonify({
+            'success': False,
+            'error': f'File troppo grande. Massimo {max_file_size // (1024*1024)}MB'
+        }), 413
+    return None
+
+def prevalidate_upload(file_storage, filename):
+    """Valida estensione, dimensione effettiva e magic bytes prima di elaborare l'upload"""
+    header = file_storage.stream.read(MAGIC_PREFIX_SIZE)
+    file_storage.stream.seek(0)
+    
+    # Dimensione reale dallo stream già ricevuto (seek, senza leggerlo): vale anche
+    # per richieste chunked o con Content-Length non significativo
+    controller = get_search_controller()
+    return controller.file_service.validate_file_prefix(
+        header, filename, FileService._get_data_size(file_storage.stream)
+    )
+
 @api_bp.route('/search', methods=['POST'])
 @validate_json_request(['query'])
 @async_route
@@ -114,6 +183,36 @@ async def search(data):
             'error': 'Errore interno del server'
         }), 500
 
+@api_bp.route('/search/summary/stream', methods=['POST'])
+@validate_json_request(['query', 'results'])
+def search_summary_stream(data):
+    """
+    Endpoint per il riassunto dei risultati in streaming (text/event-stream)
+    
+    Body JSON:
+    {
+        "query": "string",
+        "results": [{"title": "...", "content": "...", "source_type": "..."}]
+    }
+    """
+    query = data['query'].strip()
+    results = data['results']
+    
+    if not query or not isinstance(results, list):
+        return jsonify({
+            'success': False,
+            'error': 'Query e risultati sono obbligatori'
+        }), 400
+    
+    controller = get_search_controller()
+    summary_stream = controller.llm_service.generate_search_summary_stream(query, results)
+    
+    return Response(
+        stream_with_context(stream_async_events(summary_stream)),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 @api_bp.route('/upload', methods=['POST'])
 def upload_file():
     """
@@ -125,6 +224,11 @@ def upload_file():
     """
     
     try:
+        # Corpo troppo grande: risposta immediata, senza leggere il multipart
+        too_large = reject_oversized_upload()
+        if too_large is not None:
+            return too_large
+        
         # Verifica presenza file
         if 'file' not in request.files:
             return jsonify({
@@ -142,9 +246,15 @@ def upload_file():
         # Ottiene parametri opzionali
         user_id = request.form.get('user_id')
         
-        # Legge dati file
+        # Stream del file (non caricato interamente in memoria)
         filename = secure_filename(file.filename)
-        file_data = file.read()
+        
+        # Rifiuta subito upload non validi, prima di copiarli su disco
+        validation_result = prevalidate_upload(file, filename)
+        if not validation_result['valid']:
+            return jsonify({'success': False, 'error': validation_result['error']}), 400
+        
+        file_data = file.stream
         
         # Elabora file
         controller = get_search_controller()
@@ -170,6 +280,11 @@ def analyze_image():
     """
     
     try:
+        # Corpo troppo grande: risposta immediata, senza leggere il multipart
+        too_large = reject_oversized_upload()
+        if too_large is not None:
+            return too_large
+        
         if 'image' not in request.files:
             return jsonify({
                 'success': False,
@@ -186,7 +301,13 @@ def analyze_image():
         # Salva temporaneamente l'immagine
         controller = get_search_controller()
         filename = secure_filename(image_file.filename)
-        file_data = image_file.read()
+        
+        # Rifiuta subito upload non validi, prima di copiarli su disco
+        validation_result = prevalidate_upload(image_file, filename)
+        if not validation_result['valid']:
+            return jsonify({'success': False, 'error': validation_result['error']}), 400
+        
+        file_data = image_file.stream
         
         # Salva file temporaneo
         file_info = controller.file_service.save_uploaded_file(file_data, filename)
@@ -224,6 +345,11 @@ def analyze_document():
     """
     
     try:
+        # Corpo troppo grande: risposta immediata, senza leggere il multipart
+        too_large = reject_oversized_upload()
+        if too_large is not None:
+            return too_large
+        
         if 'document' not in request.files:
             return jsonify({
                 'success': False,
@@ -240,7 +366,13 @@ def analyze_document():
         # Salva temporaneamente il documento
         controller = get_search_controller()
         filename = secure_filename(doc_file.filename)
-        file_data = doc_file.read()
+        
+        # Rifiuta subito upload non validi, prima di copiarli su disco
+        validation_result = prevalidate_upload(doc_file, filename)
+        if not validation_result['valid']:
+            return jsonify({'success': False, 'error': validation_result['error']}), 400
+        
+        file_data = doc_file.stream
         
         file_info = controller.file_service.save_uploaded_file(file_data, filename)
         
@@ -4,7 +4,7 @@ Controller principale per orchestrare la ricerca attraverso gli agenti AI
 
 import logging
 import asyncio
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Union, BinaryIO
 from datetime import datetime
 import concurrent.futures
 
@@ -323,12 +323,12 @@ class SearchController:
             logger.error(f"Errore nella sintesi risultati: {e}")
             return {'success': False, 'error': str(e)}
     
-    def upload_file(self, file_data: bytes, filename: str, user_id: Optional[str] = None) -> Dict[str, Any]:
+    def upload_file(self, file_data: Union[bytes, BinaryIO], filename: str, user_id: Optional[str] = None) -> Dict[str, Any]:
         """
         Carica e elabora un file per aggiungerlo alla knowledge base
         
         Args:
-            file_data: Dati binari del file
+            file_data: Dati binari del file o stream file-like
             filename: Nome originale del file
             user_id: ID dell'utente (opzionale)
             
@@ -10,8 +10,13 @@ from openai import OpenAI
 import hashlib
 import pickle
 
+from .http_client import get_shared_http_client
+
 logger = logging.getLogger(__name__)
 
+# Numero massimo di input per singola richiesta all'API embeddings di OpenAI
+EMBEDDING_BATCH_SIZE = 2048
+
 class EmbeddingService:
     """Servizio per generare embeddings per testo e contenuti multimodali"""
     
@@ -37,7 +42,7 @@ class EmbeddingService:
             if not api_key:
                 logger.warning("OPENAI_API_KEY non configurata. Gli embeddings potrebbero non funzionare.")
             
-            self.openai_client = OpenAI(api_key=api_key)
+            self.openai_client = OpenAI(api_key=api_key, http_client=get_shared_http_client())
         
         # Cache per embeddings (opzionale)
         self.cache_enabled = config.get('cache_enabled', True)
@@ -104,36 +109,45 @@ class EmbeddingService:
             model: Modello specifico da usare (opzionale)
             
         Returns:
-            Lista di embeddings
+            Lista di embeddings, allineata a texts (vettore nullo per i testi vuoti)
         """
         if not texts:
             return []
         
         try:
-            # Filtra testi vuoti
-            valid_texts = [text for text in texts if text and text.strip()]
-            if not valid_texts:
+            # Filtra testi vuoti ricordandone la posizione
+            valid_indices = [i for i, text in enumerate(texts) if text and text.strip()]
+            if not valid_indices:
                 logger.warning("Nessun testo valido fornito per batch embedding")
                 return [[0.0] * self.text_dimensions] * len(texts)
             
             # Preprocessing
-            processed_texts = [self._preprocess_text(text) for text in valid_texts]
+            processed_texts = [self._preprocess_text(texts[i]) for i in valid_indices]
             
             if self.text_provider == 'openai':
-                response = self.openai_client.embeddings.create(
-                    model=model or self.text_model,
-                    input=processed_texts,
-                    encoding_format="float"
-                )
-                
-                embeddings = [item.embedding for item in response.data]
+                # Una richiesta per blocco di EMBEDDING_BATCH_SIZE testi
+                valid_embeddings = []
+                for start in range(0, len(processed_texts), EMBEDDING_BATCH_SIZE):
+                    response = self.openai_client.embeddings.create(
+                        model=model or self.text_model,
+                        input=processed_texts[start:start + EMBEDDING_BATCH_SIZE],
+                        encoding_format="float"
+                    )
+                    valid_embeddings.extend(item.embedding for item in response.data)
                 
-                logger.debug(f"Batch embeddings generati - Count: {len(embeddings)}")
-                return embeddings
+                logger.debug(f"Batch embeddings generati - Count: {len(valid_embeddings)}")
             
             else:
                 # Fallback: genera embeddings uno per uno
-                return [self.generate_text_embedding(text, model) for text in valid_texts]
+                valid_embeddings = [self.generate_text_embedding(texts[i], model) for i in valid_indices]
+            
+            if len(valid_indices) == len(texts):
+                return valid_embeddings
+            
+            embeddings = [[0.0] * self.text_dimensions for _ in texts]
+            for i, embedding in zip(valid_indices, valid_embeddings):
+                embeddings[i] = embedding
+            return embeddings
                 
         except Exception as e:
             logger.error(f"Errore nella generazione batch embeddings: {e}")
@@ -3,11 +3,19 @@ Servizio per la gestione e elaborazione dei file (documenti, immagini, etc.)
 """
 
 import os
+import io
+import functools
+import contextlib
+import concurrent.futures
+import threading
+import mmap
+import codecs
 import logging
 import hashlib
 import mimetypes
-from typing import Dict, List, Any, Optional, Tuple, Union
-from pathlib import Path
+from array import array
+from collections import OrderedDict
+from typing import Dict, List, Any, Optional, Tuple, Union, BinaryIO
 import uuid
 
 # Document processing
@@ -17,14 +25,173 @@ from docx import Document as DocxDocument
 import openpyxl
 from pptx import Presentation
 
+try:
+    from python_calamine import CalamineWorkbook  # Parser XLSX in Rust (opzionale)
+except ImportError:
+    CalamineWorkbook = None
+
 # Image processing
 from PIL import Image
 import pytesseract
 import cv2
 import numpy as np
 
+try:
+    import tesserocr  # API Tesseract in-process (opzionale)
+except ImportError:
+    tesserocr = None
+
+try:
+    import blake3  # Hash BLAKE3 SIMD/multi-thread (opzionale)
+except ImportError:
+    blake3 = None
+
 logger = logging.getLogger(__name__)
 
+# Namespace OOXML per la lettura diretta dell'XML di DOCX e PPTX
+W_NS = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+P_NS = '{http://schemas.openxmlformats.org/presentationml/2006/main}'
+A_NS = '{http://schemas.openxmlformats.org/drawingml/2006/main}'
+
+# Dimensione dei blocchi per letture/copie in streaming
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+# Magic bytes attesi per estensione e byte iniziali sufficienti a verificarli
+MAGIC_BYTES = {
+    'pdf': b'%PDF',
+    'jpg': b'\xff\xd8\xff',
+    'jpeg': b'\xff\xd8\xff',
+    'png': b'\x89PNG\r\n\x1a\n',
+    'gif': b'GIF8',
+    'bmp': b'BM',
+    'docx': b'PK\x03\x04',  # ZIP-based formats
+    'xlsx': b'PK\x03\x04',
+    'pptx': b'PK\x03\x04'
+}
+MAGIC_PREFIX_SIZE = 16
+
+# Sotto questa soglia l'hash legge il file in un colpo solo (mmap non conviene)
+SMALL_FILE_HASH_THRESHOLD = 64 * 1024
+
+# Algoritmi ammessi per l'hash dei file (deduplicazione, non autenticazione). Il default resta
+# SHA-256: gli hash già salvati devono continuare a corrispondere su ogni installazione.
+FILE_HASH_ALGORITHMS = ('sha256', 'blake3')
+DEFAULT_FILE_HASH_ALGORITHM = 'sha256'
+
+FileData = Union[bytes, BinaryIO]
+
+# Contenuti in memoria con len() e slicing; mmap anonimi inclusi (pagine allocate solo se lette)
+BYTES_LIKE = (bytes, bytearray, memoryview, mmap.mmap)
+
+
+# Un'istanza PyTessBaseAPI per thread: l'API Tesseract non è thread-safe
+_tess_local = threading.local()
+
+
+def _ocr_image(image: Image.Image, lang: str = 'ita+eng') -> str:
+    """Esegue l'OCR in-process con tesserocr se disponibile, altrimenti con pytesseract"""
+    apis = _tess_local.__dict__.setdefault('apis', {})
+    if tesserocr is not None and apis.get(lang) is not False:
+        try:
+            api = apis.get(lang)
+            if api is None:
+                api = apis[lang] = tesserocr.PyTessBaseAPI(lang=lang)
+            api.SetImage(image)
+            return api.GetUTF8Text()
+        except RuntimeError as e:
+            # Es. traineddata mancanti: non ritentare in questo thread
+            logger.warning(f"tesserocr non utilizzabile, fallback a pytesseract: {e}")
+            apis[lang] = False
+    
+    return pytesseract.image_to_string(image, lang=lang)
+
+
+def _init_extraction_worker():
+    """Inizializzatore dei worker: Tesseract single-thread per processo"""
+    os.environ['OMP_THREAD_LIMIT'] = '1'
+
+
+@functools.lru_cache(maxsize=1024)
+def _file_extension(filename: str) -> str:
+    """Estensione minuscola senza punto, come Path(filename).suffix ma senza allocare Path"""
+    name = os.path.basename(filename)
+    dot = name.rfind('.')
+    if dot <= 0 or dot == len(name) - 1:
+        return ''
+    return name[dot + 1:].lower()
+
+# Cache dei confini dei chunk: chiave = hash e lunghezza del testo, valore = offset (start, end)
+# appiattiti. Non trattiene né il testo né i chunk: 16 byte per chunk invece di documenti interi.
+# hash() di una str è SipHash a 64 bit, memorizzato nell'oggetto: O(1) se il testo viene riusato.
+CHUNK_CACHE_MAX_ENTRIES = 128
+_chunk_bounds_cache: "OrderedDict[Tuple[int, int, int, int], array]" = OrderedDict()
+_chunk_bounds_lock = threading.Lock()
+
+
+def _chunk_bounds(text: str, chunk_size: int, chunk_overlap: int) -> array:
+    """Calcola gli offset [start0, end0, start1, end1, ...] dei chunk di un testo"""
+    text_len = len(text)
+    bounds = array('q')
+    if text_len <= chunk_size:
+        bounds.extend((0, text_len))
+        return bounds
+    
+    append = bounds.extend
+    start = 0
+    
+    # I confini non sono a passo fisso: ogni inizio dipende dal punto di interruzione
+    # naturale del chunk precedente, quindi il ciclo resta sequenziale (rfind è già in C)
+    while True:
+        end = start + chunk_size
+        
+        # Cerca un punto di interruzione naturale (spazio, punto, etc.)
+        if end < text_len:
+            # Cerca l'ultimo spazio o punto nel chunk
+            last_space = text.rfind(' ', start, end)
+            last_period = text.rfind('.', start, end)
+            
+            natural_break = max(last_space, last_period)
+            if natural_break > start:
+                end = natural_break + 1
+        else:
+            end = text_len
+        
+        # Equivalente a text[start:end].strip() senza allocare la sottostringa intera
+        chunk_start, chunk_end = start, end
+        while chunk_start < chunk_end and text[chunk_start].isspace():
+            chunk_start += 1
+        while chunk_end > chunk_start and text[chunk_end - 1].isspace():
+            chunk_end -= 1
+        if chunk_start < chunk_end:
+            append((chunk_start, chunk_end))
+        
+        # L'ultimo chunk copre la fine del testo: i successivi ne sarebbero sottostringhe
+        if end >= text_len:
+            break
+        
+        # Garantisce l'avanzamento anche con overlap >= lunghezza del chunk
+        start = max(end - chunk_overlap, start + 1)
+    
+    return bounds
+
+
+def _chunk_text(text: str, chunk_size: int, chunk_overlap: int) -> List[str]:
+    """Chunking con confini memoizzati: lo stesso testo viene spesso ridiviso con gli stessi parametri"""
+    key = (hash(text), len(text), chunk_size, chunk_overlap)
+    with _chunk_bounds_lock:
+        bounds = _chunk_bounds_cache.get(key)
+        if bounds is not None:
+            _chunk_bounds_cache.move_to_end(key)
+    
+    if bounds is None:
+        bounds = _chunk_bounds(text, chunk_size, chunk_overlap)
+        with _chunk_bounds_lock:
+            _chunk_bounds_cache[key] = bounds
+            if len(_chunk_bounds_cache) > CHUNK_CACHE_MAX_ENTRIES:
+                _chunk_bounds_cache.popitem(last=False)
+    
+    return [text[bounds[i]:bounds[i + 1]] for i in range(0, len(bounds), 2)]
+
 class FileService:
     """Servizio per gestire upload, elaborazione e analisi di file"""
     
@@ -38,22 +205,38 @@ class FileService:
         self.config = config
         self.upload_folder = config.get('upload_folder', './data/uploads')
         self.max_file_size = config.get('max_file_size', 50) * 1024 * 1024  # MB to bytes
-        self.allowed_extensions = set(config.get('allowed_extensions', [
+        # Estensioni normalizzate (minuscole, senza punto) in un frozenset immutabile
+        self.allowed_extensions = frozenset(ext.strip().lstrip('.').lower() for ext in config.get('allowed_extensions', [
             'pdf', 'docx', 'txt', 'jpg', 'jpeg', 'png', 'gif', 'bmp', 'xlsx', 'pptx'
         ]))
+        self._allowed_extensions_label = ", ".join(sorted(self.allowed_extensions))
+        self.max_workers = config.get('max_workers') or os.cpu_count() or 1
+        
+        # Algoritmo di hash esplicito: non deve dipendere dai pacchetti installati
+        self.hash_algorithm = str(config.get('hash_algorithm', DEFAULT_FILE_HASH_ALGORITHM)).lower()
+        if self.hash_algorithm not in FILE_HASH_ALGORITHMS:
+            raise ValueError(f"hash_algorithm non supportato: {self.hash_algorithm} "
+                             f"(ammessi: {', '.join(FILE_HASH_ALGORITHMS)})")
+        if self.hash_algorithm == 'blake3' and blake3 is None:
+            raise ImportError("hash_algorithm 'blake3' configurato ma il pacchetto blake3 non è installato")
+        
+        # Tabella estensione -> MIME type precalcolata
+        if not mimetypes.inited:
+            mimetypes.init()
+        self._ext_to_mime = {ext: mimetypes.types_map.get(f'.{ext}') for ext in self.allowed_extensions}
         
         # Assicura che la directory di upload esista
         os.makedirs(self.upload_folder, exist_ok=True)
         
         logger.info(f"File Service inizializzato - Upload folder: {self.upload_folder}")
     
-    def save_uploaded_file(self, file_data: bytes, original_filename: str, 
+    def save_uploaded_file(self, file_data: FileData, original_filename: str, 
                           user_id: Optional[str] = None) -> Dict[str, Any]:
         """
         Salva un file caricato e restituisce informazioni
         
         Args:
-            file_data: Dati binari del file
+            file_data: Dati binari del file o stream file-like (es. FileStorage.stream)
             original_filename: Nome originale del file
             user_id: ID dell'utente (opzionale)
             
@@ -67,18 +250,31 @@ class FileService:
                 return validation_result
             
             # Generazione nome file unico
-            file_extension = Path(original_filename).suffix.lower()
-            unique_filename = f"{uuid.uuid4().hex}{file_extension}"
+            file_extension = _file_extension(original_filename)
+            unique_filename = f"{uuid.uuid4().hex}.{file_extension}" if file_extension else uuid.uuid4().hex
             
             # Percorso completo
             file_path = os.path.join(self.upload_folder, unique_filename)
             
-            # Salvataggio file
-            with open(file_path, 'wb') as f:
-                f.write(file_data)
-            
-            # Calcolo hash del file
-            file_hash = self._calculate_file_hash(file_data)
+            # Salvataggio su file temporaneo .part e calcolo hash, poi rename atomico
+            part_path = f"{file_path}.part"
+            try:
+                if isinstance(file_data, BYTES_LIKE):
+                    with open(part_path, 'wb') as f:
+                        f.write(file_data)
+                    file_size = len(file_data)
+                    file_hash = self._calculate_file_hash(file_data)
+                else:
+                    # Stream: copia a blocchi con hash nello stesso passaggio
+                    file_size, file_hash = self._copy_stream_to_path(file_data, part_path)
+                
+                os.replace(part_path, file_path)
+            except Exception:
+                try:
+                    os.remove(part_path)
+                except OSError:
+                    pass
+                raise
             
             # Informazioni del file
             file_info = {
@@ -86,49 +282,88 @@ class FileService:
                 'filename': unique_filename,
                 'original_filename': original_filename,
                 'file_path': file_path,
-                'file_size': len(file_data),
-                'file_type': file_extension[1:] if file_extension else 'unknown',
-                'mime_type': mimetypes.guess_type(original_filename)[0],
+                'file_size': file_size,
+                'file_type': file_extension or 'unknown',
+                'mime_type': self._guess_mime_type(original_filename),
                 'file_hash': file_hash,
+                'hash_algorithm': self.hash_algorithm,
                 'user_id': user_id
             }
             
-            logger.info(f"File salvato: {unique_filename} ({len(file_data)} bytes)")
+            logger.info(f"File salvato: {unique_filename} ({file_size} bytes)")
             return file_info
             
         except Exception as e:
             logger.error(f"Errore nel salvataggio del file: {e}")
             return {'success': False, 'error': str(e)}
     
-    def validate_file(self, file_data: bytes, filename: str) -> Dict[str, Any]:
+    def validate_file(self, file_data: FileData, filename: str) -> Dict[str, Any]:
         """
         Valida un file prima del salvataggio
         
         Args:
-            file_data: Dati binari del file
+            file_data: Dati binari del file o stream file-like
             filename: Nome del file
             
+        Returns:
+            Risultato della validazione
+        """
+        try:
+            # Dimensione, estensione e magic bytes dai soli byte iniziali
+            if isinstance(file_data, BYTES_LIKE):
+                header = bytes(file_data[:MAGIC_PREFIX_SIZE])
+            else:
+                header = self._read_stream_header(file_data, MAGIC_PREFIX_SIZE)
+            
+            prefix_result = self.validate_file_prefix(header, filename, self._get_data_size(file_data))
+            if not prefix_result['valid']:
+                return prefix_result
+            
+            # I file di testo richiedono la verifica dell'intero contenuto
+            if _file_extension(filename) == 'txt' and not self._validate_file_content(file_data, 'txt'):
+                return {
+                    'valid': False,
+                    'error': 'Contenuto del file non valido per l\'estensione specificata'
+                }
+            
+            return {'valid': True}
+            
+        except Exception as e:
+            logger.error(f"Errore nella validazione del file: {e}")
+            return {'valid': False, 'error': str(e)}
+    
+    def validate_file_prefix(self, header: bytes, filename: str,
+                             content_length: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Valida un upload dai soli byte iniziali, prima di leggerne il contenuto
+        
+        Args:
+            header: Primi byte del file (almeno MAGIC_PREFIX_SIZE)
+            filename: Nome del file
+            content_length: Dimensione dichiarata del file, se nota
+            
         Returns:
             Risultato della validazione
         """
         try:
             # Controllo dimensione
-            if len(file_data) > self.max_file_size:
+            if content_length is not None and content_length > self.max_file_size:
                 return {
                     'valid': False,
                     'error': f'File troppo grande. Massimo {self.max_file_size // (1024*1024)}MB'
                 }
             
             # Controllo estensione
-            file_extension = Path(filename).suffix.lower()[1:]  # Rimuove il punto
+            file_extension = _file_extension(filename)
             if file_extension not in self.allowed_extensions:
                 return {
                     'valid': False,
-                    'error': f'Estensione non supportata. Supportate: {", ".join(self.allowed_extensions)}'
+                    'error': f'Estensione non supportata. Supportate: {self._allowed_extensions_label}'
                 }
             
             # Controllo contenuto (magic bytes)
-            if not self._validate_file_content(file_data, file_extension):
+            expected_magic = MAGIC_BYTES.get(file_extension)
+            if expected_magic is not None and not header.startswith(expected_magic):
                 return {
                     'valid': False,
                     'error': 'Contenuto del file non valido per l\'estensione specificata'
@@ -140,35 +375,66 @@ class FileService:
             logger.error(f"Errore nella validazione del file: {e}")
             return {'valid': False, 'error': str(e)}
     
-    def extract_text_from_document(self, file_path: str, file_type: str) -> Dict[str, Any]:
+    def extract_text_from_document(self, source: Union[str, BinaryIO], file_type: str) -> Dict[str, Any]:
         """
         Estrae testo da un documento
         
         Args:
-            file_path: Percorso del file
+            source: Percorso del file o stream binario file-like (es. SpooledTemporaryFile)
             file_type: Tipo del file
             
         Returns:
             Dizionario con testo estratto e metadati
         """
         try:
+            # Gli stream vengono letti dall'inizio, come un file appena aperto
+            if hasattr(source, 'read'):
+                source.seek(0)
+            
             if file_type == 'pdf':
-                return self._extract_text_from_pdf(file_path)
+                return self._extract_text_from_pdf(source)
             elif file_type == 'docx':
-                return self._extract_text_from_docx(file_path)
+                return self._extract_text_from_docx(source)
             elif file_type == 'txt':
-                return self._extract_text_from_txt(file_path)
+                return self._extract_text_from_txt(source)
             elif file_type == 'xlsx':
-                return self._extract_text_from_xlsx(file_path)
+                return self._extract_text_from_xlsx(source)
             elif file_type == 'pptx':
-                return self._extract_text_from_pptx(file_path)
+                return self._extract_text_from_pptx(source)
             else:
                 return {'success': False, 'error': f'Tipo file non supportato: {file_type}'}
                 
         except Exception as e:
-            logger.error(f"Errore nell'estrazione testo da {file_path}: {e}")
+            logger.error(f"Errore nell'estrazione testo da {getattr(source, 'name', source)}: {e}")
             return {'success': False, 'error': str(e)}
     
+    def extract_text_batch(self, file_specs: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+        """
+        Estrae testo da più documenti in parallelo su processi separati
+        
+        Args:
+            file_specs: Lista di tuple (percorso file, tipo file)
+            
+        Returns:
+            Lista dei risultati di estrazione, nello stesso ordine di file_specs
+        """
+        if not file_specs:
+            return []
+        
+        workers = min(self.max_workers, len(file_specs))
+        if workers <= 1:
+            return [self.extract_text_from_document(path, file_type) for path, file_type in file_specs]
+        
+        paths, file_types = zip(*file_specs)
+        try:
+            with concurrent.futures.ProcessPoolExecutor(
+                max_workers=workers, initializer=_init_extraction_worker
+            ) as executor:
+                return list(executor.map(self.extract_text_from_document, paths, file_types))
+        except Exception as e:
+            logger.error(f"Errore nell'estrazione parallela, fallback sequenziale: {e}")
+            return [self.extract_text_from_document(path, file_type) for path, file_type in file_specs]
+    
     def extract_text_from_image(self, file_path: str) -> Dict[str, Any]:
         """
         Estrae testo da un'immagine usando OCR
@@ -187,7 +453,7 @@ class FileService:
             processed_image = self._preprocess_image_for_ocr(image)
             
             # Estrazione testo con Tesseract
-            extracted_text = pytesseract.image_to_string(processed_image, lang='ita+eng')
+            extracted_text = _ocr_image(processed_image).strip()
             
             # Informazioni immagine
             image_info = {
@@ -199,9 +465,9 @@ class FileService:
             
             return {
                 'success': True,
-                'extracted_text': extracted_text.strip(),
+                'extracted_text': extracted_text,
                 'image_info': image_info,
-                'text_length': len(extracted_text.strip())
+                'text_length': len(extracted_text)
             }
             
         except Exception as e:
@@ -218,26 +484,61 @@ class FileService:
         Returns:
             Dizionario con analisi dell'immagine
         """
+        result = self.process_image(file_path)
+        return result['analysis'] if result.get('success') else result
+    
+    def process_image(self, file_path: str) -> Dict[str, Any]:
+        """
+        Analizza un'immagine ed esegue l'OCR decodificandola una sola volta
+        
+        Args:
+            file_path: Percorso dell'immagine
+            
+        Returns:
+            Dizionario con 'analysis' (come analyze_image) e 'ocr'
+            (come extract_text_from_image)
+        """
         try:
-            image = Image.open(file_path)
+            with Image.open(file_path) as image:
+                image.load()
+                image_info = {
+                    'width': image.width,
+                    'height': image.height,
+                    'format': image.format,
+                    'mode': image.mode
+                }
+                rgb_image = image.convert('RGB')  # Copia decodificata, valida anche dopo la chiusura
+            
+            # Un solo passaggio OCR, riusato anche per il rilevamento del testo; un errore OCR
+            # (es. binario tesseract assente) non invalida l'analisi dell'immagine
+            ocr_error = None
+            try:
+                processed_image = self._preprocess_image_for_ocr(rgb_image)
+                extracted_text = _ocr_image(processed_image).strip()
+            except Exception as e:
+                logger.warning(f"OCR non riuscito per {file_path}: {e}")
+                ocr_error = str(e)
+                extracted_text = ''
             
-            # Informazioni base
             analysis = {
                 'success': True,
-                'width': image.width,
-                'height': image.height,
-                'format': image.format,
-                'mode': image.mode,
-                'size_bytes': os.path.getsize(file_path)
+                **image_info,
+                'size_bytes': os.path.getsize(file_path),
+                'dominant_colors': self._get_dominant_colors(rgb_image),
+                'has_text': len(extracted_text) > 10  # Soglia minima per considerare presenza di testo
             }
             
-            # Analisi colori dominanti
-            analysis['dominant_colors'] = self._get_dominant_colors(image)
-            
-            # Rilevamento oggetti base (se possibile)
-            analysis['has_text'] = self._detect_text_in_image(image)
+            if ocr_error is None:
+                ocr = {
+                    'success': True,
+                    'extracted_text': extracted_text,
+                    'image_info': image_info,
+                    'text_length': len(extracted_text)
+                }
+            else:
+                ocr = {'success': False, 'error': ocr_error}
             
-            return analysis
+            return {'success': True, 'analysis': analysis, 'ocr': ocr}
             
         except Exception as e:
             logger.error(f"Errore nell'analisi immagine {file_path}: {e}")
@@ -256,42 +557,22 @@ class FileService:
         Returns:
             Lista di chunks di testo
         """
-        if not text or len(text) <= chunk_size:
-            return [text] if text else []
+        if not text:
+            return []
         
-        chunks = []
-        start = 0
-        
-        while start < len(text):
-            end = start + chunk_size
-            
-            # Cerca un punto di interruzione naturale (spazio, punto, etc.)
-            if end < len(text):
-                # Cerca l'ultimo spazio o punto nel chunk
-                last_space = text.rfind(' ', start, end)
-                last_period = text.rfind('.', start, end)
-                
-                natural_break = max(last_space, last_period)
-                if natural_break > start:
-                    end = natural_break + 1
-            
-            chunk = text[start:end].strip()
-            if chunk:
-                chunks.append(chunk)
-            
-            start = end - chunk_overlap
-            if start >= len(text):
-                break
+        chunks = _chunk_text(text, chunk_size, chunk_overlap)
         
         logger.debug(f"Testo diviso in {len(chunks)} chunks")
         return chunks
     
-    def _extract_text_from_pdf(self, file_path: str) -> Dict[str, Any]:
+    def _extract_text_from_pdf(self, file_path: Union[str, BinaryIO]) -> Dict[str, Any]:
         """Estrae testo da PDF"""
         try:
             # Prova prima con PyMuPDF (più robusto)
-            doc = fitz.open(file_path)
-            text = ""
+            if hasattr(file_path, 'read'):
+                doc = fitz.open(stream=file_path.read(), filetype='pdf')
+            else:
+                doc = fitz.open(file_path)
             metadata = {
                 'page_count': len(doc),
                 'title': doc.metadata.get('title', ''),
@@ -299,8 +580,7 @@ class FileService:
                 'subject': doc.metadata.get('subject', '')
             }
             
-            for page in doc:
-                text += page.get_text() + "\n"
+            text = "\n".join(page.get_text() for page in doc)
             
             doc.close()
             
@@ -313,12 +593,12 @@ class FileService:
         except Exception as e:
             # Fallback a PyPDF2
             try:
-                with open(file_path, 'rb') as file:
+                if hasattr(file_path, 'read'):
+                    file_path.seek(0)
+                with (contextlib.nullcontext(file_path) if hasattr(file_path, 'read')
+                      else open(file_path, 'rb')) as file:
                     pdf_reader = PyPDF2.PdfReader(file)
-                    text = ""
-                    
-                    for page in pdf_reader.pages:
-                        text += page.extract_text() + "\n"
+                    text = "\n".join(page.extract_text() for page in pdf_reader.pages)
                     
                     metadata = {
                         'page_count': len(pdf_reader.pages),
@@ -336,20 +616,24 @@ class FileService:
                 logger.error(f"Errore con entrambi i parser PDF: {e}, {e2}")
                 return {'success': False, 'error': str(e2)}
     
-    def _extract_text_from_docx(self, file_path: str) -> Dict[str, Any]:
+    def _extract_text_from_docx(self, file_path: Union[str, BinaryIO]) -> Dict[str, Any]:
         """Estrae testo da DOCX"""
         doc = DocxDocument(file_path)
+        body = doc.element.body
         
-        text = ""
-        for paragraph in doc.paragraphs:
-            text += paragraph.text + "\n"
+        # Paragrafi letti direttamente dall'XML (evita i wrapper python-docx)
+        parts = [self._docx_paragraph_text(p) for p in body.iterchildren(W_NS + 'p')]
         
         # Estrae testo dalle tabelle
-        for table in doc.tables:
-            for row in table.rows:
-                for cell in row.cells:
-                    text += cell.text + " "
-                text += "\n"
+        for table in body.iterchildren(W_NS + 'tbl'):
+            for row in table.iterchildren(W_NS + 'tr'):
+                cells = [
+                    "\n".join(self._docx_paragraph_text(p) for p in cell.iterchildren(W_NS + 'p'))
+                    for cell in row.iterchildren(W_NS + 'tc')
+                ]
+                parts.append(" ".join(cells))
+        
+        text = "\n".join(parts)
         
         # Metadati del documento
         metadata = {
@@ -365,10 +649,18 @@ class FileService:
             'metadata': metadata
         }
     
-    def _extract_text_from_txt(self, file_path: str) -> Dict[str, Any]:
+    @staticmethod
+    def _docx_paragraph_text(paragraph) -> str:
+        """Concatena i nodi w:t di un paragrafo DOCX"""
+        return "".join(t.text for t in paragraph.iter(W_NS + 't') if t.text)
+    
+    def _extract_text_from_txt(self, file_path: Union[str, BinaryIO]) -> Dict[str, Any]:
         """Estrae testo da file TXT"""
-        with open(file_path, 'r', encoding='utf-8', errors='ignore') as file:
-            text = file.read()
+        if hasattr(file_path, 'read'):
+            text = file_path.read().decode('utf-8', errors='ignore')
+        else:
+            with open(file_path, 'r', encoding='utf-8', errors='ignore') as file:
+                text = file.read()
         
         return {
             'success': True,
@@ -376,41 +668,68 @@ class FileService:
             'metadata': {'encoding': 'utf-8'}
         }
     
-    def _extract_text_from_xlsx(self, file_path: str) -> Dict[str, Any]:
+    def _extract_text_from_xlsx(self, file_path: Union[str, BinaryIO]) -> Dict[str, Any]:
         """Estrae testo da Excel"""
-        workbook = openpyxl.load_workbook(file_path)
-        text = ""
+        if CalamineWorkbook is not None:
+            if hasattr(file_path, 'read'):
+                workbook = CalamineWorkbook.from_filelike(file_path)
+            else:
+                workbook = CalamineWorkbook.from_path(file_path)
+            sheet_names = list(workbook.sheet_names)
+            sheets = ((name, workbook.get_sheet_by_name(name).to_python()) for name in sheet_names)
+            return self._format_xlsx_rows(sheets, sheet_names)
+        
+        # Fallback openpyxl in modalità streaming (nessun oggetto Cell materializzato)
+        workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            sheet_names = workbook.sheetnames
+            sheets = ((name, workbook[name].iter_rows(values_only=True)) for name in sheet_names)
+            return self._format_xlsx_rows(sheets, sheet_names)
+        finally:
+            workbook.close()
+    
+    @staticmethod
+    def _format_xlsx_rows(sheets, sheet_names: List[str]) -> Dict[str, Any]:
+        """Formatta le righe dei fogli Excel come testo"""
+        parts = []
         
-        for sheet_name in workbook.sheetnames:
-            sheet = workbook[sheet_name]
-            text += f"\n--- {sheet_name} ---\n"
+        for sheet_name, rows in sheets:
+            parts.append(f"\n--- {sheet_name} ---")
             
-            for row in sheet.iter_rows(values_only=True):
-                row_text = " | ".join([str(cell) if cell is not None else "" for cell in row])
+            for row in rows:
+                row_text = " | ".join(["" if cell is None else str(cell) for cell in row])
                 if row_text.strip():
-                    text += row_text + "\n"
+                    parts.append(row_text)
         
         return {
             'success': True,
-            'extracted_text': text.strip(),
-            'metadata': {'sheets': workbook.sheetnames}
+            'extracted_text': "\n".join(parts).strip(),
+            'metadata': {'sheets': sheet_names}
         }
     
-    def _extract_text_from_pptx(self, file_path: str) -> Dict[str, Any]:
+    def _extract_text_from_pptx(self, file_path: Union[str, BinaryIO]) -> Dict[str, Any]:
         """Estrae testo da PowerPoint"""
         presentation = Presentation(file_path)
-        text = ""
+        parts = []
         
         for i, slide in enumerate(presentation.slides, 1):
-            text += f"\n--- Slide {i} ---\n"
-            
-            for shape in slide.shapes:
-                if hasattr(shape, "text"):
-                    text += shape.text + "\n"
+            parts.append(f"\n--- Slide {i} ---")
+            
+            # Forme di testo lette direttamente dall'XML (evita i wrapper python-pptx)
+            for shape in slide.shapes._spTree.iterchildren(P_NS + 'sp'):
+                tx_body = shape.find(P_NS + 'txBody')
+                if tx_body is None:
+                    continue
+                shape_text = "\n".join(
+                    "".join(t.text for t in paragraph.iter(A_NS + 't') if t.text)
+                    for paragraph in tx_body.iterchildren(A_NS + 'p')
+                )
+                if shape_text:
+                    parts.append(shape_text)
         
         return {
             'success': True,
-            'extracted_text': text.strip(),
+            'extracted_text': "\n".join(parts).strip(),
             'metadata': {'slide_count': len(presentation.slides)}
         }
     
@@ -454,46 +773,139 @@ class FileService:
         
         return dominant_colors
     
-    def _detect_text_in_image(self, image: Image.Image) -> bool:
-        """Rileva se un'immagine contiene testo"""
-        try:
-            # Estrazione rapida per rilevamento
-            text = pytesseract.image_to_string(image, config='--psm 6')
-            return len(text.strip()) > 10  # Soglia minima per considerare presenza di testo
-        except:
-            return False
-    
-    def _validate_file_content(self, file_data: bytes, file_extension: str) -> bool:
+    def _validate_file_content(self, file_data: FileData, file_extension: str) -> bool:
         """Valida il contenuto del file basandosi sui magic bytes"""
-        magic_bytes = {
-            'pdf': b'%PDF',
-            'jpg': b'\xff\xd8\xff',
-            'jpeg': b'\xff\xd8\xff',
-            'png': b'\x89PNG\r\n\x1a\n',
-            'gif': b'GIF8',
-            'bmp': b'BM',
-            'docx': b'PK\x03\x04',  # ZIP-based formats
-            'xlsx': b'PK\x03\x04',
-            'pptx': b'PK\x03\x04'
-        }
-        
-        if file_extension in magic_bytes:
-            expected_magic = magic_bytes[file_extension]
-            return file_data.startswith(expected_magic)
+        if file_extension in MAGIC_BYTES:
+            expected_magic = MAGIC_BYTES[file_extension]
+            if isinstance(file_data, BYTES_LIKE):
+                return bytes(file_data[:len(expected_magic)]) == expected_magic
+            return self._read_stream_header(file_data, len(expected_magic)) == expected_magic
         
         # Per file di testo, controlla che sia decodificabile
         if file_extension == 'txt':
             try:
-                file_data.decode('utf-8')
+                if isinstance(file_data, BYTES_LIKE):
+                    codecs.decode(file_data, 'utf-8')
+                else:
+                    self._decode_stream_utf8(file_data)
                 return True
             except UnicodeDecodeError:
                 return False
         
         return True  # Default per estensioni non specificate
     
-    def _calculate_file_hash(self, file_data: bytes) -> str:
-        """Calcola hash SHA-256 del file"""
-        return hashlib.sha256(file_data).hexdigest()
+    def _calculate_file_hash(self, source: Union[FileData, str, os.PathLike],
+                             chunk_size: int = STREAM_CHUNK_SIZE) -> str:
+        """
+        Calcola l'hash del file con l'algoritmo configurato (hash_algorithm)
+        
+        Args:
+            source: Dati binari, percorso su disco o stream file-like
+            chunk_size: Dimensione dei blocchi letti dagli stream
+            
+        Returns:
+            Digest esadecimale di 64 caratteri
+        """
+        if isinstance(source, BYTES_LIKE):
+            return self._new_file_hasher(source).hexdigest()
+        
+        if isinstance(source, (str, os.PathLike)):
+            return self._calculate_path_hash(source)
+        
+        # Stream: hash a blocchi con memoria costante, posizione ripristinata
+        hasher = self._new_file_hasher()
+        position = source.tell()
+        source.seek(0)
+        try:
+            for chunk in iter(lambda: source.read(chunk_size), b''):
+                hasher.update(chunk)
+        finally:
+            source.seek(position)
+        return hasher.hexdigest()
+    
+    def _calculate_path_hash(self, file_path: str) -> str:
+        """Calcola l'hash di un file su disco, scegliendo la lettura in base alla dimensione"""
+        with open(file_path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            
+            # File piccoli: una sola read, evita il costo di setup del mapping
+            if size < SMALL_FILE_HASH_THRESHOLD:
+                return self._new_file_hasher(f.read()).hexdigest()
+            
+            # File grandi con BLAKE3: mmap e hashing ad albero su più thread
+            if self.hash_algorithm == 'blake3':
+                return blake3.blake3(max_threads=blake3.blake3.AUTO).update_mmap(file_path).hexdigest()
+            
+            # File grandi: hash direttamente sulle pagine mappate, senza copie nell'heap
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                return hashlib.sha256(mm).hexdigest()
+    
+    def _new_file_hasher(self, data: bytes = b''):
+        """Crea un hasher con l'algoritmo configurato"""
+        if self.hash_algorithm == 'blake3':
+            return blake3.blake3(data)
+        return hashlib.sha256(data)
+    
+    def _guess_mime_type(self, filename: str) -> Optional[str]:
+        """Restituisce il MIME type usando la tabella precalcolata per le estensioni note"""
+        file_extension = _file_extension(filename)
+        if file_extension in self._ext_to_mime:
+            return self._ext_to_mime[file_extension]
+        return mimetypes.guess_type(filename)[0]
+    
+    @staticmethod
+    def _get_data_size(file_data: FileData) -> int:
+        """Restituisce la dimensione di bytes o di uno stream seekable"""
+        if isinstance(file_data, BYTES_LIKE):
+            return len(file_data)
+        position = file_data.tell()
+        size = file_data.seek(0, io.SEEK_END)
+        file_data.seek(position)
+        return size
+    
+    @staticmethod
+    def _read_stream_header(stream: BinaryIO, size: int) -> bytes:
+        """Legge i primi byte di uno stream lasciando invariata la posizione"""
+        position = stream.tell()
+        stream.seek(0)
+        header = stream.read(size)
+        stream.seek(position)
+        return header
+    
+    @staticmethod
+    def _decode_stream_utf8(stream: BinaryIO):
+        """Verifica a blocchi che uno stream sia UTF-8 valido"""
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        position = stream.tell()
+        stream.seek(0)
+        try:
+            for chunk in iter(lambda: stream.read(STREAM_CHUNK_SIZE), b''):
+                decoder.decode(chunk)
+            decoder.decode(b'', final=True)
+        finally:
+            stream.seek(position)
+    
+    def _copy_stream_to_path(self, stream: BinaryIO, file_path: str) -> Tuple[int, str]:
+        """
+        Copia uno stream su disco calcolando l'hash nello stesso passaggio
+        
+        Ogni blocco letto viene passato sia all'hasher sia al file di output:
+        lo stream non viene bufferizzato e il file non viene riletto per l'hash.
+        
+        Returns:
+            Tupla (byte scritti, hash del file)
+        """
+        hasher = self._new_file_hasher()
+        size = 0
+        stream.seek(0)
+        
+        with open(file_path, 'wb') as dst:
+            for chunk in iter(lambda: stream.read(STREAM_CHUNK_SIZE), b''):
+                hasher.update(chunk)
+                dst.write(chunk)
+                size += len(chunk)
+        
+        return size, hasher.hexdigest()
     
     def delete_file(self, file_path: str) -> bool:
         """
@@ -539,7 +951,7 @@ class FileService:
                 'size': stat.st_size,
                 'created': stat.st_ctime,
                 'modified': stat.st_mtime,
-                'mime_type': mimetypes.guess_type(file_path)[0]
+                'mime_type': self._guess_mime_type(file_path)
             }
             
         except Exception as e:
@@ -0,0 +1,33 @@
+"""
+Client HTTP condiviso dai servizi che usano le API OpenAI
+"""
+
+import threading
+import importlib.util
+from typing import Optional
+
+import httpx
+from openai import DefaultHttpxClient
+
+# HTTP/2 solo se il pacchetto h2 è installato (httpx lo richiede)
+HTTP2_AVAILABLE = importlib.util.find_spec('h2') is not None
+
+_shared_http_client: Optional[httpx.Client] = None
+_shared_http_client_lock = threading.Lock()
+
+def get_shared_http_client() -> httpx.Client:
+    """
+    Restituisce il client httpx condiviso, creato al primo utilizzo
+    
+    Tutte le istanze di OpenAI create dai servizi riusano lo stesso pool di
+    connessioni: niente setup TLS/pool per ogni servizio e keep-alive comune.
+    """
+    global _shared_http_client
+    if _shared_http_client is None:
+        with _shared_http_client_lock:
+            if _shared_http_client is None:
+                _shared_http_client = DefaultHttpxClient(
+                    http2=HTTP2_AVAILABLE,
+                    limits=httpx.Limits(max_connections=100, max_keepalive_connections=20)
+                )
+    return _shared_http_client
@@ -3,14 +3,323 @@ Servizio per l'integrazione con Large Language Models (GPT-5, etc.)
 """
 
 import os
+import re
+import time
 import logging
 import asyncio
-from typing import Dict, List, Optional, Any, Union
-from openai import OpenAI
+import threading
+import weakref
+from functools import lru_cache
+from collections import OrderedDict
+from typing import Dict, List, Optional, Any, Union, Tuple, AsyncIterator
+from openai import OpenAI, AsyncOpenAI, BadRequestError
+import httpx
 import json
+import numpy as np
+
+from .http_client import get_shared_http_client
+
+try:
+    import jsonschema_rs
+except ImportError:
+    jsonschema_rs = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 logger = logging.getLogger(__name__)
 
+def _json_loads(data: Union[str, bytes]) -> Any:
+    """Decodifica JSON con orjson se disponibile (orjson.JSONDecodeError deriva da json.JSONDecodeError)"""
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+def _schema_dumps(schema: Dict[str, Any]) -> str:
+    """Serializzazione canonica (chiavi ordinate, indentazione 2) di uno schema"""
+    if orjson is not None:
+        return orjson.dumps(schema, option=orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS).decode()
+    return json.dumps(schema, indent=2, sort_keys=True, ensure_ascii=False)
+
+# Estrazione del JSON da risposte con testo aggiuntivo
+_JSON_DECODER = json.JSONDecoder()
+_JSON_OBJ_RE = re.compile(r'\{.*\}', re.DOTALL)
+
+# Prompt e schemi costanti: formano un prefisso stabile per il prompt caching del provider
+QUERY_INTENT_SYSTEM_PROMPT = """Sei un esperto nell'analisi di query di ricerca. 
+Analizza la query dell'utente e determina:
+1. Il tipo di ricerca richiesta
+2. Le entità chiave
+3. Il livello di complessità
+4. Gli agenti più appropriati da utilizzare"""
+
+QUERY_INTENT_SCHEMA = {
+    "query_type": "string (text|image|document|multimodal|web)",
+    "entities": ["lista di entità chiave"],
+    "complexity": "string (simple|medium|complex)",
+    "suggested_agents": ["lista di agenti consigliati"],
+    "search_strategy": "string (semantic|keyword|hybrid)",
+    "confidence": "number (0-1)"
+}
+
+SUMMARY_SYSTEM_PROMPT = """Sei un esperto nel sintetizzare informazioni da multiple fonti.
+Crea un riassunto completo e accurato basato sui risultati di ricerca forniti.
+Il riassunto deve essere informativo, ben strutturato e rispondere direttamente alla query dell'utente."""
+
+KEYWORDS_SYSTEM_PROMPT = "Sei un esperto nell'estrazione di parole chiave. Estrai le parole chiave più rilevanti dal testo fornito."
+
+KEYWORDS_SCHEMA = {
+    "keywords": ["lista di parole chiave rilevanti"],
+    "entities": ["lista di entità nominate"],
+    "topics": ["lista di argomenti principali"]
+}
+
+SEARCH_QUERIES_SYSTEM_PROMPT = """Sei un esperto nella formulazione di query di ricerca.
+Genera query alternative che possano aiutare a trovare informazioni rilevanti per la query originale.
+Le query alternative devono essere diverse ma correlate, usando sinonimi, riformulazioni e approcci diversi."""
+
+SEARCH_QUERIES_SCHEMA = {
+    "alternative_queries": ["lista di query alternative"]
+}
+
+RELEVANCE_SYSTEM_PROMPT = """Sei un esperto nella valutazione della rilevanza dei risultati di ricerca.
+Valuta quanto il risultato fornito è rilevante per rispondere alla query dell'utente.
+Considera il contenuto, il titolo e il contesto.
+Valuta la rilevanza del risultato per la query (0 = non rilevante, 1 = perfettamente rilevante)."""
+
+RELEVANCE_SCHEMA = {
+    "relevance_score": "number (0-1)",
+    "reasoning": "string (spiegazione del punteggio)",
+    "key_matches": ["lista di elementi che corrispondono alla query"]
+}
+
+BATCH_RELEVANCE_SYSTEM_PROMPT = """Sei un esperto nella valutazione della rilevanza dei risultati di ricerca.
+Valuta quanto ciascuno dei risultati forniti è rilevante per rispondere alla query dell'utente.
+Considera il contenuto, il titolo e il contesto di ogni risultato.
+Assegna a ogni risultato, identificato dal suo indice, un punteggio (0 = non rilevante, 1 = perfettamente rilevante)."""
+
+BATCH_RELEVANCE_SCHEMA = {
+    "scores": [
+        {
+            "index": "integer (indice del risultato)",
+            "relevance_score": "number (0-1)"
+        }
+    ]
+}
+
+# Serializzazione precalcolata degli schemi costanti (chiave: id dello schema)
+_SCHEMA_JSON = {
+    id(schema): _schema_dumps(schema)
+    for schema in (QUERY_INTENT_SCHEMA, KEYWORDS_SCHEMA, SEARCH_QUERIES_SCHEMA,
+                   RELEVANCE_SCHEMA, BATCH_RELEVANCE_SCHEMA)
+}
+
+_SCHEMA_TYPES = ('string', 'number', 'integer', 'boolean')
+
+def _to_json_schema(node: Any) -> Dict[str, Any]:
+    """Traduce uno schema informale (esempio di risposta) in JSON Schema strict"""
+    if isinstance(node, dict):
+        return {
+            "type": "object",
+            "properties": {key: _to_json_schema(value) for key, value in node.items()},
+            "required": list(node),
+            "additionalProperties": False
+        }
+    if isinstance(node, list):
+        return {"type": "array", "items": _to_json_schema(node[0]) if node else {"type": "string"}}
+    
+    description = str(node)
+    type_name = description.split(' ', 1)[0]
+    return {
+        "type": type_name if type_name in _SCHEMA_TYPES else "string",
+        "description": description
+    }
+
+@lru_cache(maxsize=64)
+def _structured_output_format(schema_json: str) -> Tuple[Dict[str, Any], Any]:
+    """
+    Restituisce response_format per Structured Outputs e validatore compilato
+    
+    Memoizzato sulla serializzazione canonica dello schema: il dict restituito è
+    sempre lo stesso oggetto per lo stesso schema.
+    """
+    strict_schema = _to_json_schema(_json_loads(schema_json))
+    response_format = {
+        "type": "json_schema",
+        "json_schema": {"name": "resp", "schema": strict_schema, "strict": True}
+    }
+    validator = jsonschema_rs.validator_for(strict_schema) if jsonschema_rs else None
+    return response_format, validator
+
+class _SemanticCache:
+    """
+    Cache delle risposte LLM con lookup per similarità coseno tra embeddings
+    
+    Un livello esatto (prompt identico) viene consultato prima di calcolare
+    l'embedding, così le ripetizioni non costano neanche la chiamata embeddings.
+    """
+    
+    GROWTH_ROWS = 1024
+    
+    def __init__(self, threshold: float = 0.92, ttl: float = 3600, max_entries: int = 10000):
+        """
+        Args:
+            threshold: Similarità minima per considerare un hit
+            ttl: Validità delle risposte in secondi
+            max_entries: Numero massimo di risposte per namespace (poi FIFO)
+        """
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._namespaces: Dict[Tuple, Dict[str, Any]] = {}
+        self._exact: "OrderedDict[Tuple, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def lookup_exact(self, key: Tuple) -> Optional[str]:
+        """Restituisce la risposta per un prompt identico, se non scaduta"""
+        with self._lock:
+            entry = self._exact.get(key)
+            if entry is None:
+                return None
+            response, timestamp = entry
+            if time.monotonic() - timestamp > self.ttl:
+                del self._exact[key]
+                return None
+            self._exact.move_to_end(key)
+            return response
+    
+    def store_exact(self, key: Tuple, response: str):
+        """Memorizza una risposta per prompt identico (LRU oltre max_entries)"""
+        with self._lock:
+            self._exact[key] = (response, time.monotonic())
+            self._exact.move_to_end(key)
+            if len(self._exact) > self.max_entries:
+                self._exact.popitem(last=False)
+    
+    def lookup(self, namespace: Tuple, embedding: np.ndarray) -> Optional[str]:
+        """Restituisce la risposta più simile se sopra soglia e non scaduta"""
+        with self._lock:
+            store = self._namespaces.get(namespace)
+            if not store or store['size'] == 0:
+                return None
+            
+            scores = store['embeddings'][:store['size']] @ embedding
+            best = int(np.argmax(scores))
+            response, timestamp = store['entries'][best]
+            
+            if scores[best] >= self.threshold and time.monotonic() - timestamp <= self.ttl:
+                return response
+            return None
+    
+    def store(self, namespace: Tuple, embedding: np.ndarray, response: str):
+        """Memorizza una risposta, sovrascrivendo la più vecchia se pieno"""
+        with self._lock:
+            store = self._namespaces.get(namespace)
+            if store is None:
+                store = self._namespaces[namespace] = {
+                    'embeddings': np.empty((0, embedding.shape[0]), dtype=np.float32),
+                    'entries': [],
+                    'size': 0,
+                    'next': 0
+                }
+            
+            entry = (response, time.monotonic())
+            if store['size'] < self.max_entries:
+                # Cresce a blocchi per ammortizzare le riallocazioni
+                if store['size'] == store['embeddings'].shape[0]:
+                    rows = min(self.GROWTH_ROWS, self.max_entries - store['size'])
+                    store['embeddings'] = np.vstack([
+                        store['embeddings'],
+                        np.zeros((rows, embedding.shape[0]), dtype=np.float32)
+                    ])
+                index = store['size']
+                store['entries'].append(entry)
+                store['size'] += 1
+            else:
+                index = store['next']
+                store['entries'][index] = entry
+                store['next'] = (index + 1) % self.max_entries
+            
+            store['embeddings'][index] = embedding
+    
+    def clear(self):
+        """Svuota la cache"""
+        with self._lock:
+            self._namespaces.clear()
+            self._exact.clear()
+
+class TokenBucket:
+    """
+    Token bucket thread-safe utilizzabile sia da codice sincrono sia da coroutine
+    
+    Ogni acquisizione prenota subito i token (il saldo può diventare negativo) e
+    attende il tempo necessario a ripagare il debito: le richieste concorrenti
+    vengono così distribuite nel tempo senza polling né tentativi ripetuti.
+    """
+    
+    def __init__(self, rate: float, capacity: float):
+        """
+        Args:
+            rate: Token reintegrati al secondo
+            capacity: Numero massimo di token accumulabili (burst)
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def _reserve(self, amount: float) -> float:
+        """Prenota i token e restituisce i secondi di attesa necessari"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= amount
+            return -self._tokens / self.rate if self._tokens < 0 else 0.0
+    
+    def acquire(self, amount: float = 1):
+        """Acquisisce i token bloccando il thread corrente"""
+        wait = self._reserve(amount)
+        if wait > 0:
+            time.sleep(wait)
+    
+    async def acquire_async(self, amount: float = 1):
+        """Acquisisce i token senza bloccare l'event loop"""
+        wait = self._reserve(amount)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+class _StrictResponseUnusable(ValueError):
+    """Risposta Structured Outputs rifiutata, filtrata o troncata (JSON incompleto)"""
+
+def _is_unsupported_response_format(error: BadRequestError) -> bool:
+    """True solo se il 400 indica che il modello non supporta response_format/json_schema"""
+    param = str(getattr(error, 'param', None) or '')
+    message = str(getattr(error, 'message', None) or error).lower()
+    if 'response_format' not in param and 'response_format' not in message and 'json_schema' not in message:
+        return False
+    return 'not supported' in message or 'unsupported' in message
+
+# Servizi che hanno creato client asincroni (per chiuderli alla fine del loop)
+_async_client_owners = weakref.WeakSet()
+
+async def close_async_clients() -> None:
+    """
+    Chiude i client AsyncOpenAI creati sull'event loop corrente
+    
+    Da attendere prima di chiudere un event loop: il pool httpx del client è legato
+    al loop, e senza aclose() le sue connessioni restano aperte.
+    """
+    loop = asyncio.get_running_loop()
+    for service in list(_async_client_owners):
+        client = service._async_clients.pop(loop, None)
+        if client is not None:
+            try:
+                await client.close()
+            except Exception as e:
+                logger.warning(f"Errore nella chiusura del client asincrono: {e}")
+
 class LLMService:
     """Servizio per gestire le interazioni con i Large Language Models"""
     
@@ -27,13 +336,46 @@ class LLMService:
         self.temperature = config.get('temperature', 0.1)
         self.max_tokens = config.get('max_tokens', 4000)
         
+        # Structured Outputs nativi (disattivati automaticamente se il modello non li supporta)
+        self.structured_outputs = config.get('structured_outputs', True)
+        
         # Inizializzazione client OpenAI
         if self.provider == 'openai':
             api_key = os.getenv('OPENAI_API_KEY')
             if not api_key:
                 logger.warning("OPENAI_API_KEY non configurata. Il servizio LLM potrebbe non funzionare.")
             
-            self.client = OpenAI(api_key=api_key)
+            self.client = OpenAI(api_key=api_key, http_client=get_shared_http_client())
+            self._api_key = api_key
+        
+        # Rate limiting lato client (richieste e token al minuto, 0 = disabilitato)
+        rate_config = config.get('rate_limit', {})
+        requests_per_minute = rate_config.get('requests_per_minute', 0)
+        tokens_per_minute = rate_config.get('tokens_per_minute', 0)
+        self._rate_limiter = TokenBucket(
+            rate=requests_per_minute / 60,
+            capacity=rate_config.get('burst', max(1, requests_per_minute // 6))
+        ) if requests_per_minute else None
+        self._tpm_bucket = TokenBucket(
+            rate=tokens_per_minute / 60,
+            capacity=tokens_per_minute
+        ) if tokens_per_minute else None
+        
+        # Client asincroni, uno per event loop (il pool httpx è legato al loop)
+        self.max_concurrency = config.get('max_concurrency', 10)
+        self._async_clients = weakref.WeakKeyDictionary()
+        
+        # Cache semantica delle risposte (opzionale)
+        cache_config = config.get('semantic_cache', {})
+        self.semantic_cache_enabled = cache_config.get('enabled', False)
+        self.semantic_cache_model = cache_config.get('embedding_model', 'text-embedding-3-small')
+        self.semantic_cache_max_temperature = cache_config.get('max_temperature', 0.2)
+        self.semantic_cache_max_chars = cache_config.get('max_prompt_chars', 8000)
+        self.semantic_cache = _SemanticCache(
+            threshold=cache_config.get('threshold', 0.92),
+            ttl=cache_config.get('ttl', 3600),
+            max_entries=cache_config.get('max_entries', 10000)
+        ) if self.semantic_cache_enabled else None
         
         logger.info(f"LLM Service inizializzato - Provider: {self.provider}, Model: {self.model}")
     
@@ -50,34 +392,144 @@ class LLMService:
             La risposta generata dal modello
         """
         try:
-            messages = []
-            
-            if system_prompt:
-                messages.append({"role": "system", "content": system_prompt})
+            params = self._build_params(prompt, system_prompt, **kwargs)
             
-            messages.append({"role": "user", "content": prompt})
+            # Lookup esatto: nessuna chiamata embeddings per prompt ripetuti
+            exact_key = self._exact_cache_key(prompt, system_prompt, params)
+            if exact_key is not None:
+                cached = self.semantic_cache.lookup_exact(exact_key)
+                if cached is not None:
+                    logger.debug("LLM Response recuperata dalla cache (prompt identico)")
+                    return cached
             
-            # Parametri per la chiamata
-            params = {
-                "model": kwargs.get('model', self.model),
-                "messages": messages,
-                "temperature": kwargs.get('temperature', self.temperature),
-                "max_tokens": kwargs.get('max_tokens', self.max_tokens)
-            }
+            # Lookup nella cache semantica
+            cache_namespace, cache_embedding = self._semantic_cache_key(prompt, system_prompt, params)
+            if cache_embedding is not None:
+                cached = self.semantic_cache.lookup(cache_namespace, cache_embedding)
+                if cached is not None:
+                    logger.debug("LLM Response recuperata dalla cache semantica")
+                    return cached
             
             # Chiamata all'API
+            self._throttle(params)
             response = self.client.chat.completions.create(**params)
             
             result = response.choices[0].message.content
             
             logger.debug(f"LLM Response generata - Tokens: {response.usage.total_tokens}")
             
+            if exact_key is not None and result:
+                self.semantic_cache.store_exact(exact_key, result)
+            if cache_embedding is not None and result:
+                self.semantic_cache.store(cache_namespace, cache_embedding, result)
+            
             return result
             
         except Exception as e:
             logger.error(f"Errore nella generazione della risposta LLM: {e}")
             raise
     
+    def _estimate_tokens(self, params: Dict[str, Any]) -> int:
+        """Stima i token consumati da una richiesta (circa 4 caratteri per token)"""
+        prompt_chars = sum(len(message['content']) for message in params['messages'])
+        return prompt_chars // 4 + params['max_tokens']
+    
+    def _throttle(self, params: Dict[str, Any]):
+        """Attende che i limiti di richieste e token consentano la chiamata"""
+        if self._rate_limiter is not None:
+            self._rate_limiter.acquire(1)
+        if self._tpm_bucket is not None:
+            self._tpm_bucket.acquire(self._estimate_tokens(params))
+    
+    async def _throttle_async(self, params: Dict[str, Any]):
+        """Versione asincrona di _throttle"""
+        if self._rate_limiter is not None:
+            await self._rate_limiter.acquire_async(1)
+        if self._tpm_bucket is not None:
+            await self._tpm_bucket.acquire_async(self._estimate_tokens(params))
+    
+    def _build_params(self, prompt: str, system_prompt: Optional[str] = None, **kwargs) -> Dict[str, Any]:
+        """Costruisce i parametri della chiamata chat completions"""
+        messages = []
+        
+        if system_prompt:
+            messages.append({"role": "system", "content": system_prompt})
+        
+        messages.append({"role": "user", "content": prompt})
+        
+        params = {
+            "model": kwargs.get('model', self.model),
+            "messages": messages,
+            "temperature": kwargs.get('temperature', self.temperature),
+            "max_tokens": kwargs.get('max_tokens', self.max_tokens)
+        }
+        
+        if kwargs.get('response_format') is not None:
+            params['response_format'] = kwargs['response_format']
+        
+        return params
+    
+    def _get_async_client(self) -> AsyncOpenAI:
+        """
+        Restituisce il client AsyncOpenAI associato all'event loop corrente
+        
+        Chi crea il loop deve attendere close_async_clients() prima di chiuderlo.
+        """
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            client = AsyncOpenAI(
+                api_key=self._api_key,
+                max_retries=2,
+                http_client=httpx.AsyncClient(
+                    limits=httpx.Limits(max_connections=1000, max_keepalive_connections=200)
+                )
+            )
+            self._async_clients[loop] = client
+            _async_client_owners.add(self)
+        return client
+    
+    @staticmethod
+    def _cache_namespace(params: Dict[str, Any]) -> Tuple:
+        """Parametri che distinguono le risposte in cache"""
+        # response_format è memoizzato: la sua identità distingue gli schemi
+        return (params['model'], params['temperature'], params['max_tokens'],
+                id(params.get('response_format')))
+    
+    def _exact_cache_key(self, prompt: str, system_prompt: Optional[str],
+                         params: Dict[str, Any]) -> Optional[Tuple]:
+        """Chiave della cache esatta, None se la cache non si applica"""
+        if self.semantic_cache is None or params['temperature'] > self.semantic_cache_max_temperature:
+            return None
+        return self._cache_namespace(params) + (system_prompt, prompt)
+    
+    def _semantic_cache_key(self, prompt: str, system_prompt: Optional[str],
+                            params: Dict[str, Any]) -> Tuple[Optional[Tuple], Optional[np.ndarray]]:
+        """
+        Calcola namespace ed embedding normalizzato per la cache semantica
+        
+        Returns:
+            Tupla (namespace, embedding), con embedding None se la cache non si applica
+        """
+        if self.semantic_cache is None or params['temperature'] > self.semantic_cache_max_temperature:
+            return None, None
+        
+        key_text = f"{system_prompt or ''}\n{prompt}"
+        if len(key_text) > self.semantic_cache_max_chars:
+            # Prompt troppo lunghi verrebbero troncati dall'embedding: niente cache
+            return None, None
+        
+        try:
+            response = self.client.embeddings.create(model=self.semantic_cache_model, input=key_text)
+            embedding = np.asarray(response.data[0].embedding, dtype=np.float32)
+            norm = np.linalg.norm(embedding)
+            if norm == 0:
+                return None, None
+            return self._cache_namespace(params), embedding / norm
+        except Exception as e:
+            logger.warning(f"Cache semantica non disponibile: {e}")
+            return None, None
+    
     def generate_structured_response(self, prompt: str, schema: Dict[str, Any], 
                                    system_prompt: Optional[str] = None) -> Dict[str, Any]:
         """
@@ -92,40 +544,117 @@ class LLMService:
             Risposta strutturata come dizionario
         """
         try:
-            # Costruzione del prompt per risposta strutturata
-            structured_prompt = f"""
-{prompt}
-
-Rispondi SOLO con un JSON valido che segue questo schema:
-{json.dumps(schema, indent=2)}
-
-Non includere spiegazioni aggiuntive, solo il JSON.
-"""
+            schema_json = _SCHEMA_JSON.get(id(schema))
+            if schema_json is None:
+                schema_json = _schema_dumps(schema)
             
-            response = self.generate_response(
-                structured_prompt, 
-                system_prompt,
-                temperature=0.0  # Temperatura bassa per consistenza
-            )
+            result = self._request_structured_response(prompt, schema_json, system_prompt)
             
-            # Parsing del JSON
-            try:
-                result = json.loads(response)
-                return result
-            except json.JSONDecodeError:
-                # Tentativo di estrazione del JSON dalla risposta
-                import re
-                json_match = re.search(r'\{.*\}', response, re.DOTALL)
-                if json_match:
-                    result = json.loads(json_match.group())
-                    return result
-                else:
-                    raise ValueError("Impossibile estrarre JSON valido dalla risposta")
+            # Validazione con il validatore compilato; un solo nuovo tentativo con l'errore nel prompt
+            error = self._schema_validation_error(schema_json, result)
+            if error:
+                logger.warning(f"Risposta strutturata non conforme allo schema: {error}")
+                retry_prompt = f"""{prompt}
+
+La risposta precedente non rispettava lo schema: {error}
+Rispondi di nuovo correggendo l'errore."""
+                result = self._request_structured_response(retry_prompt, schema_json, system_prompt)
+                
+                error = self._schema_validation_error(schema_json, result)
+                if error:
+                    logger.warning(f"Risposta strutturata ancora non conforme allo schema: {error}")
+            
+            return result
                     
         except Exception as e:
             logger.error(f"Errore nella generazione della risposta strutturata: {e}")
             raise
     
+    def _request_structured_response(self, prompt: str, schema_json: str,
+                                     system_prompt: Optional[str] = None) -> Dict[str, Any]:
+        """Richiede e decodifica una risposta JSON (Structured Outputs o schema nel prompt)"""
+        if self.structured_outputs:
+            try:
+                return self._generate_strict_response(prompt, schema_json, system_prompt)
+            except BadRequestError as e:
+                # Solo un modello senza supporto json_schema disattiva i Structured Outputs;
+                # contesto troppo lungo, filtri o schema non valido restano errori
+                if not _is_unsupported_response_format(e):
+                    raise
+                logger.warning(f"Structured Outputs non supportati da {self.model}, uso lo schema nel prompt: {e}")
+                self.structured_outputs = False
+            except _StrictResponseUnusable as e:
+                # Rifiuto o JSON troncato: solo questa richiesta ripiega sullo schema nel prompt
+                logger.warning(f"Risposta Structured Outputs non utilizzabile, uso lo schema nel prompt: {e}")
+        
+        # Istruzioni e schema nel prompt di sistema (prefisso stabile),
+        # solo la parte variabile nel messaggio utente
+        structured_system_prompt = f"""{system_prompt or ''}
+
+Rispondi SOLO con un JSON valido che segue questo schema:
+{schema_json}
+
+Non includere spiegazioni aggiuntive, solo il JSON.""".lstrip()
+        
+        response = self.generate_response(
+            prompt, 
+            structured_system_prompt,
+            temperature=0.0  # Temperatura bassa per consistenza
+        )
+        if not response:
+            raise ValueError("Risposta vuota dal modello")
+        
+        # Parsing del JSON
+        try:
+            result = _json_loads(response)
+            return result
+        except json.JSONDecodeError:
+            # Tentativo di estrazione del JSON dalla risposta: decodifica dal primo '{'
+            # fermandosi alla fine dell'oggetto, poi regex come ultima risorsa
+            start = response.find('{')
+            if start >= 0:
+                try:
+                    return _JSON_DECODER.raw_decode(response, start)[0]
+                except json.JSONDecodeError:
+                    pass
+            
+            json_match = _JSON_OBJ_RE.search(response)
+            if json_match:
+                result = json.loads(json_match.group())
+                return result
+            else:
+                raise ValueError("Impossibile estrarre JSON valido dalla risposta")
+    
+    def _generate_strict_response(self, prompt: str, schema_json: str,
+                                  system_prompt: Optional[str] = None) -> Dict[str, Any]:
+        """Genera una risposta vincolata allo schema in decodifica (Structured Outputs)"""
+        response_format, _ = _structured_output_format(schema_json)
+        
+        response = self.generate_response(
+            prompt,
+            system_prompt,
+            temperature=0.0,
+            response_format=response_format
+        )
+        
+        # content None: il modello ha rifiutato la richiesta (message.refusal) o è stato filtrato
+        if response is None:
+            raise _StrictResponseUnusable("risposta rifiutata o filtrata")
+        try:
+            return _json_loads(response)
+        except json.JSONDecodeError as e:
+            # Tipicamente finish_reason == 'length': JSON troncato da max_tokens
+            raise _StrictResponseUnusable(f"JSON incompleto: {e}") from e
+    
+    def _schema_validation_error(self, schema_json: str, result: Any) -> Optional[str]:
+        """Restituisce il primo errore di validazione (validatore compilato, una volta per schema) o None"""
+        _, validator = _structured_output_format(schema_json)
+        if validator is None:
+            return None
+        
+        error = next(iter(validator.iter_errors(result)), None)
+        return getattr(error, 'message', str(error)) if error is not None else None
+    
     def analyze_query_intent(self, query: str) -> Dict[str, Any]:
         """
         Analizza l'intento di una query di ricerca
@@ -136,25 +665,9 @@ Non includere spiegazioni aggiuntive, solo il JSON.
         Returns:
             Dizionario con l'analisi dell'intento
         """
-        system_prompt = """Sei un esperto nell'analisi di query di ricerca. 
-Analizza la query dell'utente e determina:
-1. Il tipo di ricerca richiesta
-2. Le entità chiave
-3. Il livello di complessità
-4. Gli agenti più appropriati da utilizzare"""
-        
-        schema = {
-            "query_type": "string (text|image|document|multimodal|web)",
-            "entities": ["lista di entità chiave"],
-            "complexity": "string (simple|medium|complex)",
-            "suggested_agents": ["lista di agenti consigliati"],
-            "search_strategy": "string (semantic|keyword|hybrid)",
-            "confidence": "number (0-1)"
-        }
-        
         prompt = f"Analizza questa query di ricerca: '{query}'"
         
-        return self.generate_structured_response(prompt, schema, system_prompt)
+        return self.generate_structured_response(prompt, QUERY_INTENT_SCHEMA, QUERY_INTENT_SYSTEM_PROMPT)
     
     def generate_search_summary(self, query: str, results: List[Dict[str, Any]]) -> str:
         """
@@ -167,19 +680,39 @@ Analizza la query dell'utente e determina:
         Returns:
             Riassunto generato
         """
-        system_prompt = """Sei un esperto nel sintetizzare informazioni da multiple fonti.
-Crea un riassunto completo e accurato basato sui risultati di ricerca forniti.
-Il riassunto deve essere informativo, ben strutturato e rispondere direttamente alla query dell'utente."""
+        prompt = self._build_summary_prompt(query, results)
         
-        # Preparazione del contesto dai risultati
-        context = ""
-        for i, result in enumerate(results[:10], 1):  # Limita a 10 risultati
-            context += f"\n--- Risultato {i} ---\n"
-            context += f"Titolo: {result.get('title', 'N/A')}\n"
-            context += f"Contenuto: {result.get('content', '')[:500]}...\n"
-            context += f"Fonte: {result.get('source_type', 'N/A')}\n"
+        return self.generate_response(prompt, SUMMARY_SYSTEM_PROMPT)
+    
+    async def generate_search_summary_stream(self, query: str,
+                                             results: List[Dict[str, Any]]) -> AsyncIterator[str]:
+        """
+        Genera il riassunto dei risultati in streaming, un frammento alla volta
         
-        prompt = f"""
+        Args:
+            query: La query originale
+            results: Lista dei risultati di ricerca
+            
+        Yields:
+            Frammenti di testo del riassunto
+        """
+        prompt = self._build_summary_prompt(query, results)
+        
+        async for delta in self.generate_response_stream(prompt, SUMMARY_SYSTEM_PROMPT):
+            yield delta
+    
+    def _build_summary_prompt(self, query: str, results: List[Dict[str, Any]]) -> str:
+        """Costruisce il prompt per il riassunto dei risultati di ricerca"""
+        # Preparazione del contesto dai risultati (un solo join, contenuto troncato una volta)
+        context = "".join(
+            f"\n--- Risultato {i} ---\n"
+            f"Titolo: {result.get('title', 'N/A')}\n"
+            f"Contenuto: {(result.get('content') or '')[:500]}...\n"
+            f"Fonte: {result.get('source_type', 'N/A')}\n"
+            for i, result in enumerate(results[:10], 1)  # Limita a 10 risultati
+        )
+        
+        return f"""
 Query dell'utente: "{query}"
 
 Risultati di ricerca:
@@ -188,8 +721,6 @@ Risultati di ricerca:
 Genera un riassunto completo che risponda alla query dell'utente basandoti sui risultati forniti.
 Includi le fonti più rilevanti e organizza le informazioni in modo logico.
 """
-        
-        return self.generate_response(prompt, system_prompt)
     
     def extract_keywords(self, text: str) -> List[str]:
         """
@@ -201,17 +732,9 @@ Includi le fonti più rilevanti e organizza le informazioni in modo logico.
         Returns:
             Lista di parole chiave
         """
-        system_prompt = "Sei un esperto nell'estrazione di parole chiave. Estrai le parole chiave più rilevanti dal testo fornito."
-        
-        schema = {
-            "keywords": ["lista di parole chiave rilevanti"],
-            "entities": ["lista di entità nominate"],
-            "topics": ["lista di argomenti principali"]
-        }
-        
         prompt = f"Estrai parole chiave, entità e argomenti da questo testo:\n\n{text[:2000]}"
         
-        result = self.generate_structured_response(prompt, schema, system_prompt)
+        result = self.generate_structured_response(prompt, KEYWORDS_SCHEMA, KEYWORDS_SYSTEM_PROMPT)
         return result.get('keywords', [])
     
     def generate_search_queries(self, original_query: str, num_queries: int = 3) -> List[str]:
@@ -225,14 +748,6 @@ Includi le fonti più rilevanti e organizza le informazioni in modo logico.
         Returns:
             Lista di query alternative
         """
-        system_prompt = """Sei un esperto nella formulazione di query di ricerca.
-Genera query alternative che possano aiutare a trovare informazioni rilevanti per la query originale.
-Le query alternative devono essere diverse ma correlate, usando sinonimi, riformulazioni e approcci diversi."""
-        
-        schema = {
-            "alternative_queries": [f"query alternativa {i+1}" for i in range(num_queries)]
-        }
-        
         prompt = f"""
 Query originale: "{original_query}"
 
@@ -240,7 +755,7 @@ Genera {num_queries} query alternative che possano aiutare a trovare informazion
 Usa sinonimi, riformulazioni e approcci diversi.
 """
         
-        result = self.generate_structured_response(prompt, schema, system_prompt)
+        result = self.generate_structured_response(prompt, SEARCH_QUERIES_SCHEMA, SEARCH_QUERIES_SYSTEM_PROMPT)
         return result.get('alternative_queries', [])
     
     def evaluate_result_relevance(self, query: str, result: Dict[str, Any]) -> float:
@@ -254,16 +769,6 @@ Usa sinonimi, riformulazioni e approcci diversi.
         Returns:
             Score di rilevanza (0-1)
         """
-        system_prompt = """Sei un esperto nella valutazione della rilevanza dei risultati di ricerca.
-Valuta quanto il risultato fornito è rilevante per rispondere alla query dell'utente.
-Considera il contenuto, il titolo e il contesto."""
-        
-        schema = {
-            "relevance_score": "number (0-1)",
-            "reasoning": "string (spiegazione del punteggio)",
-            "key_matches": ["lista di elementi che corrispondono alla query"]
-        }
-        
         prompt = f"""
 Query: "{query}"
 
@@ -271,13 +776,57 @@ Risultato da valutare:
 Titolo: {result.get('title', 'N/A')}
 Contenuto: {result.get('content', '')[:1000]}
 Fonte: {result.get('source_type', 'N/A')}
-
-Valuta la rilevanza di questo risultato per la query (0 = non rilevante, 1 = perfettamente rilevante).
 """
         
-        evaluation = self.generate_structured_response(prompt, schema, system_prompt)
+        evaluation = self.generate_structured_response(prompt, RELEVANCE_SCHEMA, RELEVANCE_SYSTEM_PROMPT)
         return evaluation.get('relevance_score', 0.5)
     
+    def evaluate_results_relevance(self, query: str, results: List[Dict[str, Any]],
+                                   batch_size: int = 20) -> List[float]:
+        """
+        Valuta la rilevanza di più risultati con una sola chiamata per blocco
+        
+        Args:
+            query: La query originale
+            results: I risultati da valutare
+            batch_size: Numero massimo di risultati per chiamata
+            
+        Returns:
+            Score di rilevanza (0-1) nello stesso ordine dei risultati
+        """
+        scores = [0.5] * len(results)
+        
+        for offset in range(0, len(results), batch_size):
+            batch = results[offset:offset + batch_size]
+            
+            entries = "".join(
+                f"""
+--- Risultato {i} ---
+Titolo: {result.get('title', 'N/A')}
+Contenuto: {result.get('content', '')[:500]}
+Fonte: {result.get('source_type', 'N/A')}
+"""
+                for i, result in enumerate(batch)
+            )
+            
+            prompt = f"""
+Query: "{query}"
+
+Risultati da valutare:
+{entries}"""
+            
+            evaluation = self.generate_structured_response(prompt, BATCH_RELEVANCE_SCHEMA, BATCH_RELEVANCE_SYSTEM_PROMPT)
+            
+            for item in evaluation.get('scores', []):
+                try:
+                    index = int(item['index'])
+                    if 0 <= index < len(batch):
+                        scores[offset + index] = float(item['relevance_score'])
+                except (KeyError, TypeError, ValueError):
+                    continue
+        
+        return scores
+    
     async def generate_response_async(self, prompt: str, system_prompt: Optional[str] = None, **kwargs) -> str:
         """
         Versione asincrona della generazione di risposta
@@ -290,14 +839,98 @@ Valuta la rilevanza di questo risultato per la query (0 = non rilevante, 1 = per
         Returns:
             La risposta generata
         """
-        loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(
-            None, 
-            self.generate_response, 
-            prompt, 
-            system_prompt, 
-            **kwargs
-        )
+        try:
+            params = self._build_params(prompt, system_prompt, **kwargs)
+            
+            # Lookup esatto: nessuna chiamata embeddings per prompt ripetuti
+            exact_key = self._exact_cache_key(prompt, system_prompt, params)
+            if exact_key is not None:
+                cached = self.semantic_cache.lookup_exact(exact_key)
+                if cached is not None:
+                    logger.debug("LLM Response recuperata dalla cache (prompt identico)")
+                    return cached
+            
+            # Lookup nella cache semantica (embedding sincrono fuori dal loop)
+            cache_namespace, cache_embedding = None, None
+            if self.semantic_cache is not None:
+                cache_namespace, cache_embedding = await asyncio.to_thread(
+                    self._semantic_cache_key, prompt, system_prompt, params
+                )
+                if cache_embedding is not None:
+                    cached = self.semantic_cache.lookup(cache_namespace, cache_embedding)
+                    if cached is not None:
+                        logger.debug("LLM Response recuperata dalla cache semantica")
+                        return cached
+            
+            # Chiamata nativa asincrona, senza thread pool
+            await self._throttle_async(params)
+            response = await self._get_async_client().chat.completions.create(**params)
+            
+            result = response.choices[0].message.content
+            
+            logger.debug(f"LLM Response generata - Tokens: {response.usage.total_tokens}")
+            
+            if exact_key is not None and result:
+                self.semantic_cache.store_exact(exact_key, result)
+            if cache_embedding is not None and result:
+                self.semantic_cache.store(cache_namespace, cache_embedding, result)
+            
+            return result
+            
+        except Exception as e:
+            logger.error(f"Errore nella generazione della risposta LLM: {e}")
+            raise
+    
+    async def generate_response_stream(self, prompt: str, system_prompt: Optional[str] = None,
+                                       **kwargs) -> AsyncIterator[str]:
+        """
+        Genera una risposta in streaming, restituendo i frammenti appena arrivano
+        
+        Args:
+            prompt: Il prompt dell'utente
+            system_prompt: Prompt di sistema opzionale
+            **kwargs: Parametri aggiuntivi
+            
+        Yields:
+            Frammenti di testo della risposta
+        """
+        params = self._build_params(prompt, system_prompt, **kwargs)
+        
+        try:
+            await self._throttle_async(params)
+            stream = await self._get_async_client().chat.completions.create(**params, stream=True)
+        except Exception as e:
+            logger.error(f"Errore nell'avvio dello streaming LLM: {e}")
+            raise
+        
+        async with stream:
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    yield delta
+    
+    async def generate_many_async(self, prompts: List[str], system_prompt: Optional[str] = None,
+                                  **kwargs) -> List[str]:
+        """
+        Genera risposte per più prompt in parallelo sullo stesso event loop
+        
+        Args:
+            prompts: Lista di prompt
+            system_prompt: Prompt di sistema comune (opzionale)
+            **kwargs: Parametri aggiuntivi
+            
+        Returns:
+            Lista di risposte nello stesso ordine dei prompt
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        
+        async def generate(prompt: str) -> str:
+            async with semaphore:
+                return await self.generate_response_async(prompt, system_prompt, **kwargs)
+        
+        return await asyncio.gather(*(generate(prompt) for prompt in prompts))
     
     def get_model_info(self) -> Dict[str, Any]:
         """
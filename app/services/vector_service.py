@@ -4,11 +4,100 @@ Servizio per la gestione del database vettoriale (Milvus/ChromaDB)
 
 import os
 import logging
+from functools import cached_property, lru_cache
 from typing import List, Dict, Any, Optional, Tuple
 import numpy as np
 
 logger = logging.getLogger(__name__)
 
+# Quantizzazione simmetrica int8 di vettori unitari e righe convertite per blocco
+INT8_SCALE = 127.0
+INT8_BLOCK_ROWS = 8192
+
+# Righe per singola richiesta di inserimento Milvus
+MILVUS_INSERT_BATCH_ROWS = 10000
+
+def _topk_masked_numpy(scores: np.ndarray, k: int, threshold: float) -> np.ndarray:
+    """Indici dei k score più alti che superano la soglia, in ordine decrescente"""
+    candidates = np.flatnonzero(scores >= threshold)
+    if len(candidates) > k:
+        candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+    return candidates[np.argsort(-scores[candidates], kind='stable')]
+
+def _topk_masked_kernel(scores, k, threshold):
+    """
+    Soglia e top-k fusi in un'unica passata O(N) con un min-heap di dimensione k
+    
+    Stessa semantica di _topk_masked_numpy; compilato con numba se disponibile.
+    """
+    heap_scores = np.empty(k, dtype=scores.dtype)
+    heap_indices = np.empty(k, dtype=np.int64)
+    size = 0
+    
+    for i in range(scores.shape[0]):
+        score = scores[i]
+        if score < threshold:
+            continue
+        
+        if size < k:
+            # Inserimento con risalita
+            j = size
+            size += 1
+            while j > 0:
+                parent = (j - 1) // 2
+                if heap_scores[parent] <= score:
+                    break
+                heap_scores[j] = heap_scores[parent]
+                heap_indices[j] = heap_indices[parent]
+                j = parent
+            heap_scores[j] = score
+            heap_indices[j] = i
+        elif score > heap_scores[0]:
+            # Sostituzione del minimo con discesa
+            j = 0
+            while True:
+                child = 2 * j + 1
+                if child >= size:
+                    break
+                if child + 1 < size and heap_scores[child + 1] < heap_scores[child]:
+                    child += 1
+                if heap_scores[child] >= score:
+                    break
+                heap_scores[j] = heap_scores[child]
+                heap_indices[j] = heap_indices[child]
+                j = child
+            heap_scores[j] = score
+            heap_indices[j] = i
+    
+    order = np.argsort(-heap_scores[:size])
+    return heap_indices[:size][order]
+
+# faiss e numba sono gli import più pesanti del modulo: come i client dei database,
+# vengono importati solo al primo utilizzo per non rallentare l'avvio
+
+@lru_cache(maxsize=1)
+def _load_faiss():
+    """Importa faiss al primo utilizzo (None se non installato)"""
+    try:
+        import faiss
+    except ImportError:
+        logger.warning("faiss non installato: le collezioni hot useranno la ricerca standard")
+        return None
+    return faiss
+
+@lru_cache(maxsize=1)
+def _topk_masked_impl():
+    """Compila il kernel top-k con numba al primo utilizzo (fallback numpy se non installato)"""
+    try:
+        import numba
+    except ImportError:
+        return _topk_masked_numpy
+    return numba.njit(cache=True, fastmath=True)(_topk_masked_kernel)
+
+def topk_masked(scores: np.ndarray, k: int, threshold: float) -> np.ndarray:
+    """Top-k con soglia, con il kernel numba se disponibile"""
+    return _topk_masked_impl()(scores, k, threshold)
+
 class VectorService:
     """Servizio per gestire operazioni su database vettoriali"""
     
@@ -21,19 +110,49 @@ class VectorService:
         """
         self.config = config
         self.provider = config.get('provider', 'chromadb')
-        self.client = None
         self.collections = {}
+        self._loaded_milvus = set()  # collezioni Milvus già caricate in memoria
         
-        # Inizializzazione del provider
-        if self.provider == 'milvus':
-            self._init_milvus()
-        elif self.provider == 'chromadb':
-            self._init_chromadb()
-        else:
+        # Ricerca esatta in memoria (matrice float32 normalizzata per collezione, solo ChromaDB)
+        self.in_memory_search = config.get('in_memory_search', False)
+        self._cached_matrix = {}
+        self._cached_rows = {}
+        # Numero di righe lette per collezione: altri worker possono inserire nella stessa
+        # collezione, quindi la cache viene riusata solo se collection.count() coincide
+        self._cached_counts = {}
+        
+        # Collezioni "hot" servite da un indice FAISS esatto (IndexFlatIP) in RAM;
+        # ChromaDB resta lo store persistente e dei metadati
+        self.hot_collections = set(config.get('hot_collections', []))
+        self.faiss_gpu = config.get('faiss_gpu', False)
+        self._faiss_index = {}
+        
+        # Quantizzazione int8 della matrice in memoria (1/4 della memoria rispetto a float32)
+        quantization = config.get('quantization', {})
+        self.quantize_int8 = quantization.get('enabled', False) and quantization.get('dtype', 'int8') == 'int8'
+        
+        # Solo validazione del provider: import e connessione avvengono al primo utilizzo
+        if self.provider not in ('milvus', 'chromadb'):
             raise ValueError(f"Provider non supportato: {self.provider}")
         
         logger.info(f"Vector Service inizializzato - Provider: {self.provider}")
     
+    @cached_property
+    def client(self):
+        """
+        Client del database vettoriale, creato al primo utilizzo
+        
+        Per Milvus è None (si usa la connessione globale di pymilvus), salvo
+        fallback a ChromaDB se la connessione fallisce.
+        """
+        if self.provider == 'milvus':
+            return self._init_milvus()
+        return self._init_chromadb()
+    
+    def _ensure_backend(self):
+        """Importa il provider e apre la connessione se non ancora fatto"""
+        return self.client
+    
     def _init_milvus(self):
         """Inizializza connessione Milvus"""
         try:
@@ -61,7 +180,7 @@ class VectorService:
             # Fallback a ChromaDB
             logger.info("Fallback a ChromaDB")
             self.provider = 'chromadb'
-            self._init_chromadb()
+            return self._init_chromadb()
     
     def _init_chromadb(self):
         """Inizializza ChromaDB"""
@@ -75,12 +194,13 @@ class VectorService:
             os.makedirs(persist_directory, exist_ok=True)
             
             # Inizializzazione client ChromaDB
-            self.client = chromadb.PersistentClient(
+            client = chromadb.PersistentClient(
                 path=persist_directory,
                 settings=Settings(anonymized_telemetry=False)
             )
             
             logger.info(f"ChromaDB inizializzato - Directory: {persist_directory}")
+            return client
             
         except ImportError:
             logger.error("chromadb non installato. Installa con: pip install chromadb")
@@ -103,6 +223,8 @@ class VectorService:
             True se creata con successo, False altrimenti
         """
         try:
+            self._ensure_backend()
+            
             if self.provider == 'milvus':
                 return self._create_milvus_collection(collection_name, dimension, description)
             elif self.provider == 'chromadb':
@@ -181,6 +303,9 @@ class VectorService:
             if collection_name not in self.collections:
                 self.create_collection(collection_name)
             
+            # La matrice in memoria va ricostruita alla prossima ricerca
+            self._invalidate_cached_matrix(collection_name)
+            
             if self.provider == 'milvus':
                 return self._insert_milvus_vectors(collection_name, vectors, texts, metadatas)
             elif self.provider == 'chromadb':
@@ -190,24 +315,86 @@ class VectorService:
             logger.error(f"Errore nell'inserimento vettori: {e}")
             return False
     
+    def insert_vectors_bulk(self, collection_name: str, vectors: np.ndarray, texts: List[str],
+                            metadatas: Optional[List[Dict[str, Any]]] = None, flush: bool = False) -> bool:
+        """
+        Inserisce un grande batch di vettori senza flush per ogni chiamata
+        
+        Pensato per sessioni di ingestione: chiamare flush_collection una sola
+        volta al termine del ciclo di inserimenti.
+        
+        Args:
+            collection_name: Nome della collezione
+            vectors: Matrice (N, d) di vettori
+            texts: Lista di testi corrispondenti
+            metadatas: Lista di metadati (opzionale)
+            flush: Se eseguire il flush al termine dell'inserimento (solo Milvus)
+            
+        Returns:
+            True se inserimento riuscito, False altrimenti
+        """
+        try:
+            if len(vectors) == 0 or len(vectors) != len(texts):
+                logger.error("Vettori e testi devono avere la stessa lunghezza")
+                return False
+            
+            if collection_name not in self.collections:
+                self.create_collection(collection_name, dimension=len(vectors[0]))
+            
+            self._invalidate_cached_matrix(collection_name)
+            
+            if self.provider == 'milvus':
+                return self._insert_milvus_vectors(collection_name, vectors, texts, metadatas, flush=flush)
+            elif self.provider == 'chromadb':
+                return self._insert_chromadb_vectors(collection_name, vectors, texts, metadatas)
+                
+        except Exception as e:
+            logger.error(f"Errore nell'inserimento bulk vettori: {e}")
+            return False
+    
+    def flush_collection(self, collection_name: str) -> bool:
+        """
+        Rende persistenti i dati inseriti (sigilla i segmenti Milvus)
+        
+        Args:
+            collection_name: Nome della collezione
+            
+        Returns:
+            True se riuscito, False altrimenti
+        """
+        try:
+            if self.provider == 'milvus' and collection_name in self.collections:
+                self.collections[collection_name].flush()
+            return True
+            
+        except Exception as e:
+            logger.error(f"Errore nel flush della collezione {collection_name}: {e}")
+            return False
+    
     def _insert_milvus_vectors(self, collection_name: str, vectors: List[List[float]], 
-                              texts: List[str], metadatas: Optional[List[Dict[str, Any]]]) -> bool:
+                              texts: List[str], metadatas: Optional[List[Dict[str, Any]]],
+                              flush: bool = True) -> bool:
         """Inserisce vettori in Milvus"""
         try:
             collection = self.collections[collection_name]
             
-            # Preparazione dati
-            data = [
-                vectors,
-                texts,
-                metadatas or [{}] * len(vectors)
-            ]
+            # Dati per colonne, con i vettori in un unico buffer float32 contiguo
+            embeddings = np.ascontiguousarray(vectors, dtype=np.float32)
+            metadatas = metadatas or [{}] * len(texts)
             
-            # Inserimento
-            collection.insert(data)
-            collection.flush()
+            # Inserimento a blocchi per limitare la memoria per richiesta
+            for start in range(0, len(texts), MILVUS_INSERT_BATCH_ROWS):
+                end = start + MILVUS_INSERT_BATCH_ROWS
+                collection.insert([
+                    embeddings[start:end],
+                    texts[start:end],
+                    metadatas[start:end]
+                ])
             
-            logger.info(f"Inseriti {len(vectors)} vettori in Milvus collezione '{collection_name}'")
+            if flush:
+                collection.flush()
+            
+            logger.info(f"Inseriti {len(texts)} vettori in Milvus collezione '{collection_name}'")
             return True
             
         except Exception as e:
@@ -252,86 +439,284 @@ class VectorService:
         Returns:
             Lista di risultati con score e metadati
         """
+        return self.search_vectors_batch(collection_name, [query_vector], top_k, threshold)[0]
+    
+    def search_vectors_batch(self, collection_name: str, query_vectors: List[List[float]],
+                             top_k: int = 10, threshold: float = 0.0) -> List[List[Dict[str, Any]]]:
+        """
+        Cerca vettori simili per più query con una sola operazione sul database
+        
+        Args:
+            collection_name: Nome della collezione
+            query_vectors: Vettori di query
+            top_k: Numero di risultati da restituire per ogni query
+            threshold: Soglia di similarità minima
+            
+        Returns:
+            Una lista di risultati per ogni vettore di query, nello stesso ordine
+        """
         try:
             if collection_name not in self.collections:
                 logger.error(f"Collezione '{collection_name}' non trovata")
+                return [[] for _ in query_vectors]
+            
+            if not query_vectors:
                 return []
             
             if self.provider == 'milvus':
-                return self._search_milvus_vectors(collection_name, query_vector, top_k, threshold)
+                return self._search_milvus_vectors(collection_name, query_vectors, top_k, threshold)
             elif self.provider == 'chromadb':
-                return self._search_chromadb_vectors(collection_name, query_vector, top_k, threshold)
+                if collection_name in self.hot_collections and _load_faiss() is not None:
+                    return self._search_faiss_index(collection_name, query_vectors, top_k, threshold)
+                if self.in_memory_search:
+                    return self._search_cached_matrix(collection_name, query_vectors, top_k, threshold)
+                return self._search_chromadb_vectors(collection_name, query_vectors, top_k, threshold)
                 
         except Exception as e:
             logger.error(f"Errore nella ricerca vettori: {e}")
-            return []
+            return [[] for _ in query_vectors]
     
-    def _search_milvus_vectors(self, collection_name: str, query_vector: List[float], 
-                              top_k: int, threshold: float) -> List[Dict[str, Any]]:
+    def _search_milvus_vectors(self, collection_name: str, query_vectors: List[List[float]], 
+                              top_k: int, threshold: float) -> List[List[Dict[str, Any]]]:
         """Cerca vettori in Milvus"""
         try:
             collection = self.collections[collection_name]
-            collection.load()
+            if collection_name not in self._loaded_milvus:
+                collection.load()
+                self._loaded_milvus.add(collection_name)
             
             search_params = {"metric_type": "COSINE", "params": {"nprobe": 10}}
             
             results = collection.search(
-                data=[query_vector],
+                data=query_vectors,
                 anns_field="embedding",
                 param=search_params,
                 limit=top_k,
                 output_fields=["text", "metadata"]
             )
             
-            formatted_results = []
-            for hit in results[0]:
-                if hit.score >= threshold:
-                    formatted_results.append({
-                        'id': hit.id,
-                        'score': hit.score,
-                        'text': hit.entity.get('text'),
-                        'metadata': hit.entity.get('metadata', {})
-                    })
+            batch_results = []
+            for hits in results:
+                formatted_results = []
+                for hit in hits:
+                    if hit.score >= threshold:
+                        formatted_results.append({
+                            'id': hit.id,
+                            'score': hit.score,
+                            'text': hit.entity.get('text'),
+                            'metadata': hit.entity.get('metadata', {})
+                        })
+                batch_results.append(formatted_results)
             
-            logger.debug(f"Trovati {len(formatted_results)} risultati in Milvus")
-            return formatted_results
+            logger.debug(f"Trovati {sum(map(len, batch_results))} risultati in Milvus")
+            return batch_results
             
         except Exception as e:
             logger.error(f"Errore ricerca Milvus: {e}")
-            return []
+            return [[] for _ in query_vectors]
     
-    def _search_chromadb_vectors(self, collection_name: str, query_vector: List[float], 
-                                top_k: int, threshold: float) -> List[Dict[str, Any]]:
+    def _search_chromadb_vectors(self, collection_name: str, query_vectors: List[List[float]], 
+                                top_k: int, threshold: float) -> List[List[Dict[str, Any]]]:
         """Cerca vettori in ChromaDB"""
         try:
             collection = self.collections[collection_name]
             
+            # ChromaDB accetta direttamente più embeddings di query
             results = collection.query(
-                query_embeddings=[query_vector],
+                query_embeddings=query_vectors,
                 n_results=top_k
             )
             
-            formatted_results = []
-            if results['ids'] and results['ids'][0]:
-                for i in range(len(results['ids'][0])):
-                    distance = results['distances'][0][i] if results['distances'] else 0
-                    # Converte distanza in similarità (assumendo distanza coseno)
-                    similarity = 1 - distance
-                    
-                    if similarity >= threshold:
-                        formatted_results.append({
-                            'id': results['ids'][0][i],
-                            'score': similarity,
-                            'text': results['documents'][0][i] if results['documents'] else '',
-                            'metadata': results['metadatas'][0][i] if results['metadatas'] else {}
-                        })
+            all_ids = results['ids'] or [[] for _ in query_vectors]
+            all_distances = results['distances']
+            all_documents = results['documents']
+            all_metadatas = results['metadatas']
             
-            logger.debug(f"Trovati {len(formatted_results)} risultati in ChromaDB")
-            return formatted_results
+            batch_results = []
+            for q, ids in enumerate(all_ids):
+                if not ids:
+                    batch_results.append([])
+                    continue
+                
+                documents = all_documents[q] if all_documents else [''] * len(ids)
+                metadatas = all_metadatas[q] if all_metadatas else [{}] * len(ids)
+                # Converte distanza in similarità (assumendo distanza coseno)
+                similarities = 1.0 - np.asarray(all_distances[q] if all_distances else [0.0] * len(ids))
+                
+                batch_results.append([
+                    {
+                        'id': ids[i],
+                        'score': float(similarities[i]),
+                        'text': documents[i],
+                        'metadata': metadatas[i]
+                    }
+                    for i in np.flatnonzero(similarities >= threshold).tolist()
+                ])
+            
+            logger.debug(f"Trovati {sum(map(len, batch_results))} risultati in ChromaDB")
+            return batch_results
             
         except Exception as e:
             logger.error(f"Errore ricerca ChromaDB: {e}")
-            return []
+            return [[] for _ in query_vectors]
+    
+    def _load_collection_matrix(self, collection_name: str) -> np.ndarray:
+        """Legge gli embeddings della collezione come matrice float32 normalizzata e ne memorizza le righe"""
+        data = self.collections[collection_name].get(include=['embeddings', 'documents', 'metadatas'])
+        ids = data['ids']
+        embeddings = data['embeddings']
+        
+        dimension = len(embeddings[0]) if len(ids) else 0
+        matrix = np.asarray(embeddings, dtype=np.float32).reshape(len(ids), dimension)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix = np.ascontiguousarray(matrix / np.maximum(norms, 1e-12))
+        
+        self._cached_counts[collection_name] = len(ids)
+        self._cached_rows[collection_name] = (
+            ids,
+            data['documents'] or [''] * len(ids),
+            data['metadatas'] or [{}] * len(ids)
+        )
+        return matrix
+    
+    def _get_cached_matrix(self, collection_name: str) -> np.ndarray:
+        """Materializza (una volta) gli embeddings della collezione come matrice float32 normalizzata"""
+        matrix = self._cached_matrix.get(collection_name)
+        if matrix is None or not self._is_cache_fresh(collection_name):
+            self._invalidate_cached_matrix(collection_name)
+            matrix = self._load_collection_matrix(collection_name)
+            if self.quantize_int8:
+                matrix = np.round(matrix * INT8_SCALE).astype(np.int8)
+            
+            self._cached_matrix[collection_name] = matrix
+            logger.debug(f"Matrice in memoria per '{collection_name}': {matrix.shape}")
+        return matrix
+    
+    def _get_faiss_index(self, collection_name: str):
+        """
+        Costruisce (una volta) l'indice FAISS esatto della collezione a partire da ChromaDB
+        
+        Per una collezione vuota memorizza None, così le ricerche successive non la rileggono.
+        """
+        if collection_name in self._faiss_index and self._is_cache_fresh(collection_name):
+            return self._faiss_index[collection_name]
+        
+        self._invalidate_cached_matrix(collection_name)
+        matrix = self._load_collection_matrix(collection_name)
+        index = None
+        if matrix.shape[0]:
+            faiss = _load_faiss()
+            index = faiss.IndexFlatIP(matrix.shape[1])
+            if self.faiss_gpu and faiss.get_num_gpus() > 0:
+                index = faiss.index_cpu_to_gpu(faiss.StandardGpuResources(), 0, index)
+            index.add(matrix)
+            logger.debug(f"Indice FAISS per '{collection_name}': {index.ntotal} vettori")
+        
+        self._faiss_index[collection_name] = index
+        return index
+    
+    def _is_cache_fresh(self, collection_name: str) -> bool:
+        """Verifica economica (count) che la cache in memoria rifletta ancora la collezione"""
+        cached_count = self._cached_counts.get(collection_name)
+        if cached_count is None:
+            return False
+        try:
+            return self.collections[collection_name].count() == cached_count
+        except Exception as e:
+            # Senza conteggio si continua a servire la cache esistente
+            logger.warning(f"Conteggio della collezione '{collection_name}' non disponibile: {e}")
+            return True
+    
+    def _invalidate_cached_matrix(self, collection_name: str):
+        """Scarta la matrice in memoria e l'indice FAISS di una collezione"""
+        self._cached_matrix.pop(collection_name, None)
+        self._cached_rows.pop(collection_name, None)
+        self._cached_counts.pop(collection_name, None)
+        self._faiss_index.pop(collection_name, None)
+    
+    def _search_faiss_index(self, collection_name: str, query_vectors: List[List[float]],
+                            top_k: int, threshold: float) -> List[List[Dict[str, Any]]]:
+        """Ricerca esatta top-k su indice FAISS a prodotto interno (vettori normalizzati)"""
+        try:
+            index = self._get_faiss_index(collection_name)
+            if index is None:
+                return [[] for _ in query_vectors]
+            ids, texts, metadatas = self._cached_rows[collection_name]
+            
+            queries = np.asarray(query_vectors, dtype=np.float32)
+            queries = np.ascontiguousarray(queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12))
+            
+            distances, indices = index.search(queries, min(top_k, index.ntotal))
+            
+            batch_results = []
+            for row_indices, row_scores in zip(indices.tolist(), distances.tolist()):
+                batch_results.append([
+                    {
+                        'id': ids[i],
+                        'score': score,
+                        'text': texts[i],
+                        'metadata': metadatas[i]
+                    }
+                    for i, score in zip(row_indices, row_scores) if i >= 0 and score >= threshold
+                ])
+            
+            return batch_results
+            
+        except Exception as e:
+            logger.error(f"Errore ricerca FAISS: {e}")
+            return [[] for _ in query_vectors]
+    
+    def _score_matrix(self, queries: np.ndarray, matrix: np.ndarray) -> np.ndarray:
+        """Calcola le similarità coseno (B, N) tra query normalizzate e matrice in memoria"""
+        if matrix.dtype != np.int8:
+            # (B, d) @ (d, N): sgemm BLAS
+            return queries @ matrix.T
+        
+        # NumPy non ha GEMM int8: la matrice resta int8 in RAM e viene convertita a
+        # blocchi in float32 per lo sgemm, con la query quantizzata allo stesso modo
+        quantized_queries = np.round(queries * INT8_SCALE).astype(np.float32)
+        scores = np.empty((len(queries), matrix.shape[0]), dtype=np.float32)
+        for start in range(0, matrix.shape[0], INT8_BLOCK_ROWS):
+            block = matrix[start:start + INT8_BLOCK_ROWS].astype(np.float32)
+            np.matmul(quantized_queries, block.T, out=scores[:, start:start + len(block)])
+        scores /= INT8_SCALE * INT8_SCALE
+        return scores
+    
+    def _search_cached_matrix(self, collection_name: str, query_vectors: List[List[float]],
+                              top_k: int, threshold: float) -> List[List[Dict[str, Any]]]:
+        """Ricerca esatta per similarità coseno con un'unica moltiplicazione matriciale"""
+        try:
+            matrix = self._get_cached_matrix(collection_name)
+            ids, texts, metadatas = self._cached_rows[collection_name]
+            
+            k = min(top_k, matrix.shape[0])
+            if k == 0:
+                return [[] for _ in query_vectors]
+            
+            queries = np.asarray(query_vectors, dtype=np.float32)
+            queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+            
+            scores = self._score_matrix(queries, matrix)
+            
+            batch_results = []
+            for row_scores in scores:
+                # Soglia e top-k in un'unica passata
+                top = topk_masked(row_scores, k, np.float32(threshold))
+                batch_results.append([
+                    {
+                        'id': ids[i],
+                        'score': score,
+                        'text': texts[i],
+                        'metadata': metadatas[i]
+                    }
+                    for i, score in zip(top.tolist(), row_scores[top].tolist())
+                ])
+            
+            return batch_results
+            
+        except Exception as e:
+            logger.error(f"Errore ricerca in memoria: {e}")
+            return [[] for _ in query_vectors]
     
     def delete_collection(self, collection_name: str) -> bool:
         """
@@ -344,15 +729,20 @@ class VectorService:
             True se eliminazione riuscita, False altrimenti
         """
         try:
+            self._ensure_backend()
+            
             if self.provider == 'milvus':
                 if collection_name in self.collections:
                     self.collections[collection_name].drop()
                     del self.collections[collection_name]
+                self._loaded_milvus.discard(collection_name)
             elif self.provider == 'chromadb':
                 self.client.delete_collection(collection_name)
                 if collection_name in self.collections:
                     del self.collections[collection_name]
             
+            self._invalidate_cached_matrix(collection_name)
+            
             logger.info(f"Collezione '{collection_name}' eliminata")
             return True
             
@@ -404,6 +794,8 @@ class VectorService:
             Lista dei nomi delle collezioni
         """
         try:
+            self._ensure_backend()
+            
             if self.provider == 'milvus':
                 from pymilvus import utility
                 return utility.list_collections()
@@ -3,28 +3,153 @@ Route per servire il frontend statico
 """
 
 import os
-from flask import Blueprint, send_from_directory, current_app
+import gzip
+import hashlib
+import mimetypes
+from flask import Blueprint, Response, send_from_directory, current_app, request, abort
+from werkzeug.security import safe_join
 
 static_bp = Blueprint('static_routes', __name__)
 
+# Asset con hash nel nome (build Vite): il contenuto non cambia mai per lo stesso URL
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+def scan_static_files(root):
+    """
+    Elenca ricorsivamente (os.scandir) i file sotto root come percorsi relativi con '/'
+    
+    Args:
+        root: Directory statica del frontend
+        
+    Returns:
+        frozenset dei percorsi relativi dei file
+    """
+    files = []
+    pending = ['']
+    while pending:
+        prefix = pending.pop()
+        try:
+            entries = os.scandir(os.path.join(root, prefix))
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                relative_path = prefix + entry.name
+                if entry.is_dir():
+                    pending.append(relative_path + '/')
+                elif entry.is_file():
+                    files.append(relative_path)
+    return frozenset(files)
+
+def load_index_html(root):
+    """
+    Legge index.html una sola volta e ne prepara la versione gzip e gli ETag
+    
+    Returns:
+        Dizionario encoding -> (contenuto, etag), vuoto se index.html non esiste
+    """
+    try:
+        with open(os.path.join(root, 'index.html'), 'rb') as f:
+            data = f.read()
+    except OSError:
+        return {}
+    
+    etag = hashlib.md5(data).hexdigest()
+    return {
+        'identity': (data, etag),
+        'gzip': (gzip.compress(data, compresslevel=9, mtime=0), f"{etag}-gz")
+    }
+
+@static_bp.record_once
+def _init_static_files(state):
+    """Precalcola l'elenco dei file statici e index.html alla registrazione del blueprint"""
+    app = state.app
+    app.extensions['static_files'] = scan_static_files(app.static_folder) if app.static_folder else frozenset()
+    app.extensions['static_index'] = load_index_html(app.static_folder) if app.static_folder else {}
+
+def get_static_files():
+    """Restituisce l'elenco dei file statici (ricalcolato a ogni richiesta in debug)"""
+    if current_app.debug:
+        current_app.extensions['static_files'] = scan_static_files(current_app.static_folder)
+    return current_app.extensions['static_files']
+
+def serve_index():
+    """Serve index.html dalla memoria con ETag e risposta 304 per If-None-Match"""
+    if current_app.debug:
+        current_app.extensions['static_index'] = load_index_html(current_app.static_folder)
+    variants = current_app.extensions['static_index']
+    if not variants:
+        abort(404)
+    
+    encoding = 'gzip' if 'gzip' in request.accept_encodings else 'identity'
+    data, etag = variants[encoding]
+    
+    response = Response(data, mimetype='text/html')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.vary.add('Accept-Encoding')
+    if encoding == 'gzip':
+        response.headers['Content-Encoding'] = 'gzip'
+    return response.make_conditional(request)
+
+# Varianti precompresse servite se presenti accanto al file, in ordine di preferenza
+PRECOMPRESSED_ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+def send_static_file(directory, filename, immutable=False):
+    """
+    Serve un file statico preferendo la variante precompressa (.br/.gz) accettata dal client
+    
+    Args:
+        directory: Directory da cui servire il file
+        filename: Percorso relativo del file
+        immutable: Se il file può essere messo in cache per sempre (asset con hash)
+    """
+    response = None
+    for encoding, extension in PRECOMPRESSED_ENCODINGS:
+        compressed_path = safe_join(directory, filename + extension)
+        if encoding in request.accept_encodings and compressed_path and os.path.isfile(compressed_path):
+            response = send_from_directory(
+                directory,
+                filename + extension,
+                mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+            )
+            response.headers['Content-Encoding'] = encoding
+            break
+    
+    if response is None:
+        response = send_from_directory(directory, filename)
+    
+    response.vary.add('Accept-Encoding')
+    if immutable:
+        response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    else:
+        # Rivalidazione con ETag/Last-Modified a ogni navigazione
+        response.headers['Cache-Control'] = 'no-cache'
+    return response
+
 @static_bp.route('/')
 def serve_frontend():
     """Serve la homepage del frontend"""
-    return send_from_directory(current_app.static_folder, 'index.html')
+    return serve_index()
 
 @static_bp.route('/<path:path>')
 def serve_static_files(path):
     """Serve file statici del frontend"""
-    try:
-        return send_from_directory(current_app.static_folder, path)
-    except FileNotFoundError:
-        # Se il file non esiste, serve index.html per il routing client-side
-        return send_from_directory(current_app.static_folder, 'index.html')
+    if path in get_static_files():
+        return send_static_file(current_app.static_folder, path)
+    
+    # Gli endpoint API inesistenti restano 404 (gestiti dagli error handler JSON)
+    if path.startswith('api/'):
+        abort(404)
+    
+    # Se il file non esiste, serve index.html per il routing client-side
+    return serve_index()
 
 @static_bp.route('/assets/<path:filename>')
 def serve_assets(filename):
     """Serve asset del frontend (CSS, JS, immagini)"""
-    return send_from_directory(
+    return send_static_file(
         os.path.join(current_app.static_folder, 'assets'), 
-        filename
+        filename,
+        immutable=True
     )
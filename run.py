@@ -6,7 +6,22 @@ Deep Search AI - Applicazione principale
 import os
 import sys
 import logging
-from app import create_app
+
+# Variabili d'ambiente necessarie e opzionali ma consigliate (nome, descrizione)
+_REQUIRED_ENV = (
+    ('OPENAI_API_KEY', 'Chiave API OpenAI per GPT-5 e embeddings'),
+)
+
+_OPTIONAL_ENV = (
+    ('SECRET_KEY', 'Chiave segreta per Flask (usa quella di default in sviluppo)'),
+    ('DATABASE_URL', 'URL del database (usa SQLite di default)'),
+)
+
+# Directory necessarie all'avvio
+_REQUIRED_DIRS = ('./data', './data/uploads', './data/chroma', './logs')
+
+# La verifica dell'ambiente viene eseguita una sola volta per processo
+_environment_checked = False
 
 def main():
     """Funzione principale per avviare l'applicazione"""
@@ -20,6 +35,12 @@ def main():
     logger = logging.getLogger(__name__)
     
     try:
+        # Verifica delle variabili d'ambiente necessarie
+        check_environment()
+        
+        # Import differito: le dipendenze pesanti vengono caricate solo qui
+        from app import create_app
+        
         # Creazione dell'applicazione Flask
         app = create_app()
         
@@ -35,59 +56,102 @@ def main():
         logger.info(f"Avvio Deep Search AI su {host}:{port}")
         logger.info(f"Debug mode: {debug}")
         
-        # Verifica delle variabili d'ambiente necessarie
-        check_environment()
-        
-        # Avvio dell'applicazione
-        app.run(
-            host=host,
-            port=port,
-            debug=debug,
-            threaded=True
-        )
+        # Avvio dell'applicazione: server di sviluppo solo in debug
+        if debug:
+            app.run(
+                host=host,
+                port=port,
+                debug=debug,
+                threaded=True
+            )
+        else:
+            serve_production(app, host, port, app_config)
         
     except Exception as e:
         logger.error(f"Errore nell'avvio dell'applicazione: {e}")
         sys.exit(1)
 
-def check_environment():
-    """Verifica che le variabili d'ambiente necessarie siano configurate"""
+def serve_production(app, host, port, app_config):
+    """Avvia l'app con un server WSGI di produzione (waitress su Windows, gunicorn altrove)"""
     
     logger = logging.getLogger(__name__)
     
-    # Variabili d'ambiente opzionali ma consigliate
-    env_vars = {
-        'OPENAI_API_KEY': 'Chiave API OpenAI per GPT-5 e embeddings',
-        'SECRET_KEY': 'Chiave segreta per Flask (usa quella di default in sviluppo)',
-        'DATABASE_URL': 'URL del database (usa SQLite di default)',
-    }
+    server = app_config.get('server', 'auto')
+    if server == 'auto':
+        server = 'waitress' if sys.platform == 'win32' else 'gunicorn'
     
-    missing_vars = []
+    try:
+        if server == 'waitress':
+            from waitress import serve
+            threads = app_config.get('threads', 16)
+            logger.info(f"Server WSGI: waitress ({threads} thread)")
+            serve(app, host=host, port=port, threads=threads)
+            return
+        
+        if server == 'gunicorn':
+            from gunicorn.app.base import BaseApplication
+            
+            from app import create_app
+            
+            class GunicornApp(BaseApplication):
+                """
+                Gunicorn con un'app creata in ogni worker dopo il fork
+                
+                Niente preload_app: client del database vettoriale (SQLite di ChromaDB)
+                e cache non devono essere condivisi tra processi. Gli import pesanti
+                sono già stati fatti dal master e vengono ereditati dai worker.
+                """
+                
+                def load_config(self):
+                    self.cfg.set('bind', f"{host}:{port}")
+                    self.cfg.set('workers', app_config.get('workers', (os.cpu_count() or 1) * 2 + 1))
+                    self.cfg.set('threads', app_config.get('threads', 2))
+                
+                def load(self):
+                    return create_app()
+            
+            logger.info("Server WSGI: gunicorn")
+            GunicornApp().run()
+            return
+        
+        logger.warning(f"Server WSGI non supportato: {server}")
     
-    for var, description in env_vars.items():
-        if not os.getenv(var):
-            if var == 'OPENAI_API_KEY':
-                missing_vars.append(f"  {var}: {description}")
-            else:
-                logger.info(f"Variabile d'ambiente {var} non configurata: {description}")
+    except ImportError as e:
+        logger.warning(f"Server WSGI {server} non disponibile ({e}), uso il server di sviluppo Flask")
+    
+    app.run(host=host, port=port, threaded=True)
+
+def check_environment():
+    """Verifica che le variabili d'ambiente necessarie siano configurate (una volta per processo)"""
     
+    global _environment_checked
+    if _environment_checked:
+        return
+    _environment_checked = True
+    
+    logger = logging.getLogger(__name__)
+    
+    missing_vars = [var for var, _ in _REQUIRED_ENV if not os.environ.get(var)]
     if missing_vars:
         logger.warning("Variabili d'ambiente mancanti (necessarie per il funzionamento completo):")
-        for var in missing_vars:
-            logger.warning(var)
+        for var, description in _REQUIRED_ENV:
+            if var in missing_vars:
+                logger.warning(f"  {var}: {description}")
         logger.warning("L'applicazione potrebbe non funzionare correttamente senza queste variabili.")
     
-    # Verifica directory necessarie
-    directories = [
-        './data',
-        './data/uploads',
-        './logs'
-    ]
+    # Le variabili opzionali vengono controllate solo se il log INFO è attivo
+    if logger.isEnabledFor(logging.INFO):
+        for var, description in _OPTIONAL_ENV:
+            if not os.environ.get(var):
+                logger.info(f"Variabile d'ambiente {var} non configurata: {description}")
     
-    for directory in directories:
-        if not os.path.exists(directory):
-            os.makedirs(directory, exist_ok=True)
+    # Verifica directory necessarie
+    for directory in _REQUIRED_DIRS:
+        try:
+            os.makedirs(directory)
             logger.info(f"Directory creata: {directory}")
+        except FileExistsError:
+            pass
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Script per generare le varianti precompresse (.gz/.br) dei file statici del frontend
+"""
+
+import sys
+import gzip
+from pathlib import Path
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Estensioni testuali che beneficiano della compressione
+COMPRESSIBLE_EXTENSIONS = {'.html', '.js', '.css', '.json', '.svg', '.txt', '.map', '.xml'}
+MIN_SIZE = 1024
+
+def compress_static(static_dir):
+    """Crea file .gz (e .br se brotli è installato) accanto a ogni file statico comprimibile"""
+    
+    static_dir = Path(static_dir)
+    print(f"📦 Compressione file statici in {static_dir}...")
+    
+    if brotli is None:
+        print("⚠️  brotli non installato: genero solo le varianti .gz")
+    
+    count = 0
+    for path in static_dir.rglob('*'):
+        if not path.is_file() or path.suffix not in COMPRESSIBLE_EXTENSIONS:
+            continue
+        
+        data = path.read_bytes()
+        if len(data) < MIN_SIZE:
+            continue
+        
+        # mtime=0 per output deterministico
+        path.with_name(path.name + '.gz').write_bytes(gzip.compress(data, compresslevel=9, mtime=0))
+        if brotli is not None:
+            path.with_name(path.name + '.br').write_bytes(brotli.compress(data, quality=11))
+        
+        count += 1
+    
+    print(f"✅ {count} file compressi")
+
+if __name__ == "__main__":
+    default_dir = Path(__file__).parent.parent / "app" / "static"
+    compress_static(sys.argv[1] if len(sys.argv) > 1 else default_dir)
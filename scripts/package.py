@@ -5,23 +5,233 @@ Script per creare un package distribuibile di Deep Search AI
 
 import os
 import sys
+import json
 import shutil
+import re
+import uuid
+import threading
+import fnmatch
 import zipfile
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 import subprocess
 from pathlib import Path
 
-def create_package():
-    """Crea un package completo per distribuzione locale"""
+# Template copiati nel package (install.sh, install.bat, config.example.yaml, QUICK_START.md)
+TEMPLATES_DIR = Path(__file__).parent / "templates"
+
+# Manifest (mtime_ns, size) dei sorgenti per la modalità incrementale
+MANIFEST_NAME = ".package-manifest.json"
+
+# Pattern esclusi dalla copia nel package
+IGNORE_PATTERNS = (
+    '__pycache__', '*.pyc', '*.pyo', '.git', 'node_modules',
+    '.pytest_cache', '.coverage', '*.log'
+)
+
+# Directory escluse dall'archivio ZIP
+ZIP_EXCLUDED_DIRS = frozenset({'.git', '__pycache__', 'node_modules'})
+
+# Formati già compressi: archiviati senza deflate
+NO_COMPRESS_EXTENSIONS = frozenset({
+    '.png', '.jpg', '.jpeg', '.gif', '.ico', '.zip', '.gz', '.br', '.whl', '.woff', '.woff2'
+})
+
+# Buffer di copia più ampio su Windows (CopyFileEx/readinto); file oltre la soglia copiati con sendfile
+WINDOWS_COPY_BUFSIZE = 16 * 1024 * 1024
+LARGE_FILE_THRESHOLD = 64 * 1024 * 1024
+
+# Deflate livello 1 in parallelo per i file fino a ZIP_PARALLEL_MAX_SIZE; oltre, streaming da zipfile
+ZIP_DEFLATE_LEVEL = 1
+ZIP_PARALLEL_MAX_SIZE = 16 * 1024 * 1024
+
+def _fast_copy(src, dst, *, follow_symlinks=True):
+    """
+    shutil.copy2 con copia zero-copy esplicita (os.sendfile) per i file grandi
+    
+    Se sendfile non è utilizzabile tra file (es. macOS) si ripiega su copyfileobj.
+    """
+    src, dst = str(src), str(dst)
+    if os.path.isdir(dst):
+        dst = os.path.join(dst, os.path.basename(src))
+    
+    if hasattr(os, 'sendfile') and not os.path.islink(src):
+        size = os.stat(src).st_size
+        if size > LARGE_FILE_THRESHOLD:
+            with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+                try:
+                    offset = 0
+                    while offset < size:
+                        sent = os.sendfile(fdst.fileno(), fsrc.fileno(), offset, size - offset)
+                        if sent == 0:
+                            break
+                        offset += sent
+                except OSError:
+                    fsrc.seek(0)
+                    fdst.seek(0)
+                    fdst.truncate()
+                    shutil.copyfileobj(fsrc, fdst, shutil.COPY_BUFSIZE)
+            shutil.copystat(src, dst)
+            return dst
+    
+    return shutil.copy2(src, dst, follow_symlinks=follow_symlinks)
+
+@lru_cache(maxsize=None)
+def _compile_ignore(ignore_globs):
+    """Unisce i pattern glob in una sola regex compilata"""
+    return re.compile("|".join(fnmatch.translate(pattern) for pattern in ignore_globs))
+
+def _is_ignored(name, ignore_globs):
+    """Verifica se un nome di file o directory corrisponde a un pattern escluso"""
+    return _compile_ignore(ignore_globs).match(name) is not None
+
+def _ignore_names(ignore_globs):
+    """Callback ignore per shutil.copytree basata sulla regex precompilata"""
+    ignore_re = _compile_ignore(ignore_globs)
+    
+    def ignore(directory, names):
+        return [name for name in names if ignore_re.match(name)]
+    
+    return ignore
+
+def _prune_ignored(root, ignore_globs):
+    """Rimuove da root le voci annidate che corrispondono ai pattern esclusi"""
+    for current, dirs, files in os.walk(root):
+        for name in [d for d in dirs if _is_ignored(d, ignore_globs)]:
+            shutil.rmtree(os.path.join(current, name))
+            dirs.remove(name)
+        for name in files:
+            if _is_ignored(name, ignore_globs):
+                os.unlink(os.path.join(current, name))
+
+def _discard_dir(path):
+    """Rinomina la directory in un cestino e la elimina in un thread in background"""
+    trash = path.with_name(f".trash-{uuid.uuid4().hex}")
+    os.rename(path, trash)
+    worker = threading.Thread(target=shutil.rmtree, args=(trash,), kwargs={'ignore_errors': True})
+    worker.start()
+    return worker
+
+def _fast_copytree(src, dst, ignore_globs=IGNORE_PATTERNS):
+    """
+    Copia una directory con il copiatore nativo del sistema operativo
+    
+    Windows: robocopy multi-thread. Linux: cp con reflink (copy-on-write dove
+    supportato). macOS: cp con clonefile. shutil.copytree resta l'ultima risorsa.
+    """
+    dst.mkdir(parents=True, exist_ok=True)
+    
+    try:
+        if sys.platform == 'win32':
+            result = subprocess.run(
+                ["robocopy", str(src), str(dst), "/E", "/MT:32", "/NFL", "/NDL", "/NJH", "/NJS",
+                 "/XD", *ignore_globs, "/XF", *ignore_globs],
+                stdout=subprocess.DEVNULL
+            )
+            # robocopy: codici 0-7 indicano successo
+            if result.returncode <= 7:
+                return
+        else:
+            # Le voci escluse di primo livello (es. node_modules) non vengono copiate affatto
+            children = [str(entry.path) for entry in os.scandir(src) if not _is_ignored(entry.name, ignore_globs)]
+            if not children:
+                return
+            
+            clone_flag = "-c" if sys.platform == 'darwin' else "--reflink=auto"
+            result = subprocess.run(["cp", "-a", clone_flag, *children, str(dst)], stderr=subprocess.DEVNULL)
+            if result.returncode != 0 and sys.platform == 'darwin':
+                # clonefile non disponibile (filesystem non APFS)
+                result = subprocess.run(["cp", "-a", *children, str(dst)])
+            if result.returncode == 0:
+                _prune_ignored(dst, ignore_globs)
+                return
+    except OSError:
+        pass
+    
+    shutil.copytree(src, dst, ignore=_ignore_names(ignore_globs),
+                    copy_function=_fast_copy, dirs_exist_ok=True)
+
+def _iter_source_files(directory, ignore_globs):
+    """Elenca ricorsivamente i file sorgente non esclusi come (percorso, stat)"""
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if _is_ignored(entry.name, ignore_globs):
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                yield from _iter_source_files(entry.path, ignore_globs)
+            else:
+                yield entry.path, entry.stat()
+
+def _load_manifest(manifest_path):
+    """Carica il manifest della build precedente (vuoto se assente o illeggibile)"""
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _sync_incremental(project_root, package_dir, include_items, previous):
+    """Copia solo i file con mtime/dimensione diversi dal manifest e rimuove quelli spariti"""
+    current = {}
+    copied = 0
+    
+    for item in include_items:
+        src = project_root / item
+        if not src.exists():
+            print(f"  ⚠️ {item} non trovato")
+            continue
+        
+        files = _iter_source_files(src, IGNORE_PATTERNS) if src.is_dir() else [(str(src), src.stat())]
+        for file_path, stat in files:
+            rel_path = os.path.relpath(file_path, project_root)
+            signature = [stat.st_mtime_ns, stat.st_size]
+            current[rel_path] = signature
+            
+            dst = package_dir / rel_path
+            if previous.get(rel_path) != signature or not dst.exists():
+                dst.parent.mkdir(parents=True, exist_ok=True)
+                _fast_copy(file_path, dst)
+                copied += 1
+        print(f"  ✓ {item}")
+    
+    for rel_path in previous.keys() - current.keys():
+        try:
+            os.remove(package_dir / rel_path)
+        except FileNotFoundError:
+            pass
+    
+    print(f"  📄 File copiati: {copied}/{len(current)}")
+    return current
+
+def create_package(incremental=False):
+    """Crea un package completo per distribuzione locale
+    
+    Con incremental=True ricopia solo i file modificati dall'ultima build e
+    rigenera l'archivio ZIP solo se qualcosa è cambiato.
+    """
     
     print("🚀 Creazione package Deep Search AI...")
     
+    # Buffer di copia: 16MB su Windows, default (sendfile) altrove
+    if sys.platform == 'win32':
+        shutil.COPY_BUFSIZE = WINDOWS_COPY_BUFSIZE
+    
     # Directory di lavoro
     project_root = Path(__file__).parent.parent
     package_dir = project_root / "dist" / "deep-search-ai-package"
     
-    # Pulisce directory esistente
-    if package_dir.exists():
-        shutil.rmtree(package_dir)
+    zip_path = package_dir.parent / "deep-search-ai-package.zip"
+    manifest_path = package_dir.parent / MANIFEST_NAME
+    previous = _load_manifest(manifest_path) if incremental and package_dir.exists() else {}
+    
+    # Pulisce directory esistente (rename immediato, eliminazione in background)
+    cleanup = None
+    if not incremental:
+        cleanup = _discard_dir(package_dir) if package_dir.exists() else None
+        if manifest_path.exists():
+            manifest_path.unlink()
     
     package_dir.mkdir(parents=True, exist_ok=True)
     
@@ -45,22 +255,22 @@ def create_package():
     
     # Copia file nel package
     print("📋 Copia file nel package...")
-    for item in include_items:
-        src = project_root / item
-        dst = package_dir / item
-        
-        if src.exists():
-            if src.is_dir():
-                shutil.copytree(src, dst, ignore=shutil.ignore_patterns(
-                    '__pycache__', '*.pyc', '*.pyo', '.git', 'node_modules',
-                    '.pytest_cache', '.coverage', '*.log'
-                ))
+    if incremental:
+        current = _sync_incremental(project_root, package_dir, include_items, previous)
+    else:
+        for item in include_items:
+            src = project_root / item
+            dst = package_dir / item
+            
+            if src.exists():
+                if src.is_dir():
+                    _fast_copytree(src, dst)
+                else:
+                    dst.parent.mkdir(parents=True, exist_ok=True)
+                    _fast_copy(src, dst)
+                print(f"  ✓ {item}")
             else:
-                dst.parent.mkdir(parents=True, exist_ok=True)
-                shutil.copy2(src, dst)
-            print(f"  ✓ {item}")
-        else:
-            print(f"  ⚠️ {item} non trovato")
+                print(f"  ⚠️ {item} non trovato")
     
     # Crea script di installazione semplificato
     create_install_script(package_dir)
@@ -71,308 +281,125 @@ def create_package():
     # Crea documentazione di avvio rapido
     create_quick_start(package_dir)
     
-    # Crea archivio ZIP
-    create_zip_archive(package_dir)
+    # Crea archivio ZIP (in modalità incrementale solo se i sorgenti sono cambiati)
+    if not incremental or current != previous or not zip_path.exists():
+        create_zip_archive(package_dir)
+    else:
+        print("📦 Archivio ZIP invariato")
+    
+    # Il manifest viene salvato solo dopo un archivio completo
+    if incremental:
+        with open(manifest_path, 'w', encoding='utf-8') as f:
+            json.dump(current, f)
+    
+    # Attende la rimozione del package precedente
+    if cleanup is not None:
+        cleanup.join()
     
     print("✅ Package creato con successo!")
     print(f"📦 Percorso: {package_dir}")
-    print(f"📦 Archivio: {package_dir.parent / 'deep-search-ai-package.zip'}")
+    print(f"📦 Archivio: {zip_path}")
 
 def create_install_script(package_dir):
-    """Crea script di installazione semplificato"""
+    """Copia gli script di installazione semplificati"""
     
     # Script Linux/macOS
     install_sh = package_dir / "install.sh"
-    with open(install_sh, 'w') as f:
-        f.write("""#!/bin/bash
-
-# Script di installazione Deep Search AI
-
-set -e
-
-echo "🚀 Installazione Deep Search AI..."
-
-# Controlla Python
-if ! command -v python3 &> /dev/null; then
-    echo "❌ Python 3 non trovato. Installa Python 3.8+ da python.org"
-    exit 1
-fi
-
-echo "✅ Python trovato"
-
-# Crea ambiente virtuale
-if [ ! -d "venv" ]; then
-    echo "📦 Creazione ambiente virtuale..."
-    python3 -m venv venv
-fi
-
-# Attiva ambiente virtuale
-echo "🔧 Attivazione ambiente virtuale..."
-source venv/bin/activate
-
-# Installa dipendenze
-echo "📥 Installazione dipendenze..."
-pip install --upgrade pip
-pip install -r requirements.txt
-
-# Crea directory necessarie
-mkdir -p data/uploads data/chroma logs
-
-echo ""
-echo "✅ Installazione completata!"
-echo ""
-echo "🚀 Per avviare l'applicazione:"
-echo "   ./start.sh"
-echo ""
-echo "🔑 Non dimenticare di impostare OPENAI_API_KEY:"
-echo "   export OPENAI_API_KEY='your-api-key'"
-echo ""
-""")
-    
+    shutil.copyfile(TEMPLATES_DIR / "install.sh", install_sh)
     os.chmod(install_sh, 0o755)
     
     # Script Windows
-    install_bat = package_dir / "install.bat"
-    with open(install_bat, 'w') as f:
-        f.write("""@echo off
-
-REM Script di installazione Deep Search AI
-
-echo 🚀 Installazione Deep Search AI...
-
-REM Controlla Python
-python --version >nul 2>&1
-if errorlevel 1 (
-    echo ❌ Python non trovato. Installa Python 3.8+ da python.org
-    pause
-    exit /b 1
-)
-
-echo ✅ Python trovato
-
-REM Crea ambiente virtuale
-if not exist "venv" (
-    echo 📦 Creazione ambiente virtuale...
-    python -m venv venv
-)
-
-REM Attiva ambiente virtuale
-echo 🔧 Attivazione ambiente virtuale...
-call venv\\Scripts\\activate.bat
-
-REM Installa dipendenze
-echo 📥 Installazione dipendenze...
-python -m pip install --upgrade pip
-pip install -r requirements.txt
-
-REM Crea directory necessarie
-if not exist "data" mkdir data
-if not exist "data\\uploads" mkdir data\\uploads
-if not exist "data\\chroma" mkdir data\\chroma
-if not exist "logs" mkdir logs
-
-echo.
-echo ✅ Installazione completata!
-echo.
-echo 🚀 Per avviare l'applicazione:
-echo    start.bat
-echo.
-echo 🔑 Non dimenticare di impostare OPENAI_API_KEY:
-echo    set OPENAI_API_KEY=your-api-key
-echo.
-pause
-""")
+    shutil.copyfile(TEMPLATES_DIR / "install.bat", package_dir / "install.bat")
 
 def create_example_config(package_dir):
-    """Crea file di configurazione esempio"""
-    
-    config_example = package_dir / "config.example.yaml"
-    with open(config_example, 'w') as f:
-        f.write("""# Configurazione esempio per Deep Search AI
-# Copia questo file in config.yaml e modifica i valori
-
-flask:
-  secret_key: "change-this-secret-key-in-production"
-  debug: false
-  max_content_length: 52428800  # 50MB
-
-llm:
-  provider: "openai"
-  model: "gpt-4o"  # o "gpt-5" quando disponibile
-  api_key: "${OPENAI_API_KEY}"
-  max_tokens: 2000
-  temperature: 0.7
-
-embedding:
-  provider: "openai"
-  model: "text-embedding-3-large"
-  api_key: "${OPENAI_API_KEY}"
-  batch_size: 100
-
-vector_db:
-  provider: "chroma"
-  persist_directory: "./data/chroma"
-
-file_service:
-  upload_folder: "./data/uploads"
-  max_file_size: 50  # MB
-  allowed_extensions: ["pdf", "docx", "txt", "jpg", "jpeg", "png", "gif", "xlsx", "pptx"]
-
-agents:
-  text:
-    enabled: true
-    max_results: 10
-  image:
-    enabled: true
-    max_results: 10
-    ocr_enabled: true
-  document:
-    enabled: true
-    max_results: 10
-  web:
-    enabled: true
-    max_results: 10
-    max_pages: 5
-  synthesis:
-    enabled: true
-
-database:
-  url: "sqlite:///./data/app.db"
-
-logging:
-  level: "INFO"
-  file: "./logs/deep_search_ai.log"
-""")
+    """Copia il file di configurazione esempio"""
+    shutil.copyfile(TEMPLATES_DIR / "config.example.yaml", package_dir / "config.example.yaml")
 
 def create_quick_start(package_dir):
-    """Crea guida di avvio rapido"""
+    """Copia la guida di avvio rapido"""
+    shutil.copyfile(TEMPLATES_DIR / "QUICK_START.md", package_dir / "QUICK_START.md")
+
+def _iter_package_files(directory, excluded_dirs):
+    """Elenca ricorsivamente i file con os.scandir (tipo letto dalla directory entry, senza stat)"""
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                if entry.name not in excluded_dirs:
+                    yield from _iter_package_files(entry.path, excluded_dirs)
+            else:
+                yield entry.path
+
+def _deflate_member(file_path):
+    """Legge e comprime un file (deflate raw); zlib rilascia il GIL, quindi gira in parallelo nel pool"""
+    with open(file_path, 'rb') as f:
+        data = f.read()
+    compressor = zlib.compressobj(ZIP_DEFLATE_LEVEL, zlib.DEFLATED, -zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush(), zlib.crc32(data), len(data)
+
+def _write_deflated_member(zipf, zinfo, deflated, crc, file_size):
+    """Scrive nell'archivio un membro già compresso (stessa sequenza di ZipFile.mkdir)"""
+    zinfo.compress_type = zipfile.ZIP_DEFLATED
+    zinfo.CRC = crc
+    zinfo.file_size = file_size
+    zinfo.compress_size = len(deflated)
     
-    quick_start = package_dir / "QUICK_START.md"
-    with open(quick_start, 'w') as f:
-        f.write("""# 🚀 Avvio Rapido - Deep Search AI
-
-## 📋 Prerequisiti
-
-- **Python 3.8+** installato sul sistema
-- **OpenAI API Key** (ottieni da https://platform.openai.com/)
-- **4GB RAM** minimo, 8GB raccomandato
-
-## ⚡ Installazione in 3 Passi
-
-### 1. Installa Dipendenze
-```bash
-# Linux/macOS
-./install.sh
-
-# Windows
-install.bat
-```
-
-### 2. Configura API Key
-```bash
-# Linux/macOS
-export OPENAI_API_KEY="your-openai-api-key-here"
-
-# Windows
-set OPENAI_API_KEY=your-openai-api-key-here
-```
-
-### 3. Avvia l'Applicazione
-```bash
-# Linux/macOS
-./scripts/start.sh
-
-# Windows
-scripts\\start.bat
-```
-
-## 🌐 Accesso all'Applicazione
-
-- **Backend API**: http://localhost:5000
-- **Frontend Web**: http://localhost:3000 (se avviato separatamente)
-
-## 🔧 Configurazione Avanzata
-
-1. Copia `config.example.yaml` in `config.yaml`
-2. Modifica i parametri secondo le tue esigenze
-3. Riavvia l'applicazione
-
-## 📚 Funzionalità Principali
-
-### 🔍 Ricerca Intelligente
-- Ricerca semantica avanzata
-- Supporto multi-modale (testo, immagini, documenti)
-- Agenti AI specializzati
-
-### 📄 Elaborazione Documenti
-- PDF, DOCX, Excel, PowerPoint
-- Estrazione testo automatica
-- Analisi contenuto con AI
-
-### 🖼️ Analisi Immagini
-- OCR (riconoscimento testo)
-- Descrizione automatica
-- Ricerca per similarità
-
-### 🌐 Ricerca Web
-- Crawling intelligente
-- Analisi contenuti online
-- Sintesi automatica
-
-## 🆘 Risoluzione Problemi
-
-### Errore "Module not found"
-```bash
-pip install -r requirements.txt
-```
-
-### Errore OpenAI API
-- Verifica che la API key sia corretta
-- Controlla il credito disponibile su OpenAI
-
-### Errore di avvio
-- Controlla i log in `logs/deep_search_ai.log`
-- Verifica che la porta 5000 sia libera
-
-## 📞 Supporto
-
-- **Documentazione**: README.md
-- **Deployment**: DEPLOYMENT.md
-- **Issues**: https://github.com/enzococca/deep-search-ai/issues
-
-## 🎯 Prossimi Passi
-
-1. Carica alcuni documenti nella knowledge base
-2. Prova diverse tipologie di ricerca
-3. Esplora le API REST
-4. Personalizza la configurazione
-
-Buon utilizzo! 🚀
-""")
+    with zipf._lock:
+        if zipf._seekable:
+            zipf.fp.seek(zipf.start_dir)
+        zinfo.header_offset = zipf.fp.tell()
+        zipf._writecheck(zinfo)
+        zipf._didModify = True
+        
+        zipf.filelist.append(zinfo)
+        zipf.NameToInfo[zinfo.filename] = zinfo
+        zipf.fp.write(zinfo.FileHeader(False))
+        zipf.fp.write(deflated)
+        zipf.start_dir = zipf.fp.tell()
 
 def create_zip_archive(package_dir):
     """Crea archivio ZIP del package"""
     
     zip_path = package_dir.parent / "deep-search-ai-package.zip"
+    base_dir = str(package_dir.parent)
+    workers = os.cpu_count() or 1
     
     print("📦 Creazione archivio ZIP...")
     
-    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-        for root, dirs, files in os.walk(package_dir):
-            # Esclude directory non necessarie
-            dirs[:] = [d for d in dirs if d not in ['.git', '__pycache__', 'node_modules']]
+    def write_member(file_path, zinfo, future):
+        if future is not None:
+            _write_deflated_member(zipf, zinfo, *future.result())
+        elif os.path.splitext(file_path)[1].lower() in NO_COMPRESS_EXTENSIONS:
+            # I formati già compressi vengono solo archiviati
+            zipf.write(file_path, zinfo.filename, compress_type=zipfile.ZIP_STORED)
+        else:
+            zipf.write(file_path, zinfo.filename)
+    
+    # Deflate livello 1: quasi tutto il rapporto di compressione sul testo a una frazione del costo CPU.
+    # I file vengono compressi nel pool e scritti in ordine; la finestra limita la memoria in uso.
+    with zipfile.ZipFile(zip_path, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=ZIP_DEFLATE_LEVEL) as zipf, \
+            ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for file_path in _iter_package_files(str(package_dir), ZIP_EXCLUDED_DIRS):
+            zinfo = zipfile.ZipInfo.from_file(file_path, os.path.relpath(file_path, base_dir))
+            
+            future = None
+            if (zinfo.file_size <= ZIP_PARALLEL_MAX_SIZE
+                    and os.path.splitext(file_path)[1].lower() not in NO_COMPRESS_EXTENSIONS):
+                future = pool.submit(_deflate_member, file_path)
+            pending.append((file_path, zinfo, future))
             
-            for file in files:
-                file_path = Path(root) / file
-                arc_path = file_path.relative_to(package_dir.parent)
-                zipf.write(file_path, arc_path)
+            if len(pending) > workers * 4:
+                write_member(*pending.popleft())
+        
+        while pending:
+            write_member(*pending.popleft())
     
     print(f"✅ Archivio creato: {zip_path}")
     print(f"📊 Dimensione: {zip_path.stat().st_size / 1024 / 1024:.1f} MB")
 
 if __name__ == "__main__":
     try:
-        create_package()
+        create_package(incremental='--incremental' in sys.argv[1:])
     except KeyboardInterrupt:
         print("\n❌ Operazione annullata dall'utente")
         sys.exit(1)
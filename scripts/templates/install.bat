@@ -0,0 +1,47 @@
+@echo off
+
+REM Script di installazione Deep Search AI
+
+echo 🚀 Installazione Deep Search AI...
+
+REM Controlla Python
+python --version >nul 2>&1
+if errorlevel 1 (
+    echo ❌ Python non trovato. Installa Python 3.8+ da python.org
+    pause
+    exit /b 1
+)
+
+echo ✅ Python trovato
+
+REM Crea ambiente virtuale
+if not exist "venv" (
+    echo 📦 Creazione ambiente virtuale...
+    python -m venv venv
+)
+
+REM Attiva ambiente virtuale
+echo 🔧 Attivazione ambiente virtuale...
+call venv\Scripts\activate.bat
+
+REM Installa dipendenze
+echo 📥 Installazione dipendenze...
+python -m pip install --upgrade pip
+pip install -r requirements.txt
+
+REM Crea directory necessarie
+if not exist "data" mkdir data
+if not exist "data\uploads" mkdir data\uploads
+if not exist "data\chroma" mkdir data\chroma
+if not exist "logs" mkdir logs
+
+echo.
+echo ✅ Installazione completata!
+echo.
+echo 🚀 Per avviare l'applicazione:
+echo    start.bat
+echo.
+echo 🔑 Non dimenticare di impostare OPENAI_API_KEY:
+echo    set OPENAI_API_KEY=your-api-key
+echo.
+pause
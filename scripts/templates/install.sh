@@ -0,0 +1,43 @@
+#!/bin/bash
+
+# Script di installazione Deep Search AI
+
+set -e
+
+echo "🚀 Installazione Deep Search AI..."
+
+# Controlla Python
+if ! command -v python3 &> /dev/null; then
+    echo "❌ Python 3 non trovato. Installa Python 3.8+ da python.org"
+    exit 1
+fi
+
+echo "✅ Python trovato"
+
+# Crea ambiente virtuale
+if [ ! -d "venv" ]; then
+    echo "📦 Creazione ambiente virtuale..."
+    python3 -m venv venv
+fi
+
+# Attiva ambiente virtuale
+echo "🔧 Attivazione ambiente virtuale..."
+source venv/bin/activate
+
+# Installa dipendenze
+echo "📥 Installazione dipendenze..."
+pip install --upgrade pip
+pip install -r requirements.txt
+
+# Crea directory necessarie
+mkdir -p data/uploads data/chroma logs
+
+echo ""
+echo "✅ Installazione completata!"
+echo ""
+echo "🚀 Per avviare l'applicazione:"
+echo "   ./start.sh"
+echo ""
+echo "🔑 Non dimenticare di impostare OPENAI_API_KEY:"
+echo "   export OPENAI_API_KEY='your-api-key'"
+echo ""
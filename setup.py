@@ -25,6 +25,7 @@ setup(
     long_description_content_type="text/markdown",
     url="https://github.com/yourusername/deep-search-ai",
     packages=find_packages(),
+    py_modules=["run"],
     classifiers=[
         "Development Status :: 4 - Beta",
         "Intended Audience :: Developers",
@@ -66,7 +67,7 @@ setup(
     entry_points={
         "console_scripts": [
             "deep-search-ai=run:main",
-            "deep-search-server=run:run_server",
+            "deep-search-ai-wsgi=gunicorn.app.wsgiapp:run",
         ],
     },
     include_package_data=True,
@@ -6,17 +6,40 @@ Ottimizzato per deployment su servizi cloud
 
 import os
 import sys
+import threading
 from pathlib import Path
 
 # Aggiungi la directory root al path
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
-# Importa l'applicazione
-from app import create_app
+_app = None
+_app_lock = threading.Lock()
 
-# Crea l'istanza dell'app
-app = create_app()
+def get_app():
+    """Crea l'applicazione Flask al primo utilizzo (import pesanti differiti)"""
+    global _app
+    if _app is None:
+        with _app_lock:
+            if _app is None:
+                from app import create_app
+                _app = create_app()
+    return _app
+
+class LazyApp:
+    """Applicazione WSGI che crea l'app Flask alla prima richiesta"""
+    
+    def __init__(self, factory):
+        self._factory = factory
+    
+    def __call__(self, environ, start_response):
+        return self._factory()(environ, start_response)
+    
+    def __getattr__(self, name):
+        return getattr(self._factory(), name)
+
+# Istanza WSGI importabile dagli host (il server è in ascolto prima della creazione dell'app)
+app = application = LazyApp(get_app)
 
 if __name__ == '__main__':
     # Configurazione per deployment
@@ -29,7 +52,7 @@ if __name__ == '__main__':
     print(f"🔧 Debug: {debug}")
     print(f"🌍 Environment: {os.environ.get('FLASK_ENV', 'production')}")
     
-    app.run(
+    get_app().run(
         host=host,
         port=port,
         debug=debug,
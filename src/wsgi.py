@@ -0,0 +1,18 @@
+"""
+Modulo WSGI per gunicorn --preload
+
+L'app viene creata all'import: con --preload il processo master paga una sola
+volta gli import pesanti e i worker la condividono dopo il fork.
+
+    gunicorn --preload --workers=4 --threads=2 src.wsgi:app
+"""
+
+import sys
+from pathlib import Path
+
+# Aggiungi la directory root al path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.main import get_app
+
+app = application = get_app()
@@ -3,14 +3,35 @@ Test base per l'applicazione Deep Search AI
 """
 
 import pytest
+import io
 import json
 import os
-import tempfile
+from werkzeug.test import Client
+from werkzeug.wrappers import Response
 from app import create_app
+from app.api.routes import MULTIPART_OVERHEAD
+from app.services.file_service import FileService
+from app.services.vector_service import VectorService
 
-@pytest.fixture
-def app():
-    """Fixture per l'applicazione Flask"""
+class _FileOnlyController:
+    """Controller con il solo FileService, per i test di validazione degli upload"""
+    __slots__ = ('file_service',)
+    
+    def __init__(self, file_service):
+        self.file_service = file_service
+
+# Corpi JSON pre-serializzati e riusati tra i test
+_EMPTY_JSON = json.dumps({})
+_EMPTY_QUERY_JSON = json.dumps({'query': ''})
+_TEST_QUERY_JSON = json.dumps({'query': 'test query'})
+
+@pytest.fixture(scope="session")
+def app(tmp_path_factory):
+    """Fixture per l'applicazione Flask (creata una sola volta per sessione)"""
+    
+    # Directory temporanee gestite da pytest
+    upload_folder = str(tmp_path_factory.mktemp('uploads'))
+    persist_directory = str(tmp_path_factory.mktemp('chroma'))
     
     # Configurazione di test
     test_config = {
@@ -23,7 +44,7 @@ def app():
             'url': 'sqlite:///:memory:'
         },
         'file_service': {
-            'upload_folder': tempfile.mkdtemp(),
+            'upload_folder': upload_folder,
             'max_file_size': 10,  # 10MB per test
             'allowed_extensions': ['txt', 'pdf', 'jpg', 'png']
         },
@@ -39,7 +60,7 @@ def app():
         },
         'vector_db': {
             'provider': 'mock',
-            'persist_directory': tempfile.mkdtemp()
+            'persist_directory': persist_directory
         },
         'agents': {
             'text': {'enabled': True, 'max_results': 5},
@@ -62,12 +83,17 @@ def app():
     
     return app
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def client(app):
     """Fixture per il client di test"""
     return app.test_client()
 
-@pytest.fixture
+@pytest.fixture(scope="session")
+def raw_client(app):
+    """Client WSGI Werkzeug senza la gestione dei contesti del test client Flask"""
+    return Client(app.wsgi_app, Response)
+
+@pytest.fixture(scope="session")
 def runner(app):
     """Fixture per il runner CLI"""
     return app.test_cli_runner()
@@ -75,33 +101,33 @@ def runner(app):
 class TestBasicRoutes:
     """Test per le route base dell'applicazione"""
     
-    def test_index_route(self, client):
+    def test_index_route(self, raw_client):
         """Test della route principale"""
-        response = client.get('/')
+        response = raw_client.get('/')
         assert response.status_code == 200
         
-        data = json.loads(response.data)
+        data = response.get_json()
         assert data['message'] == 'Deep Search AI API'
         assert data['version'] == '1.0.0'
         assert data['status'] == 'running'
         assert 'endpoints' in data
     
-    def test_health_route(self, client):
+    def test_health_route(self, raw_client):
         """Test della route di health check"""
-        response = client.get('/health')
+        response = raw_client.get('/health')
         assert response.status_code == 200
         
-        data = json.loads(response.data)
+        data = response.get_json()
         assert data['status'] == 'healthy'
         assert data['service'] == 'Deep Search AI'
         assert 'timestamp' in data
     
-    def test_api_health_route(self, client):
+    def test_api_health_route(self, raw_client):
         """Test della route API health"""
-        response = client.get('/api/v1/health')
+        response = raw_client.get('/api/v1/health')
         assert response.status_code in [200, 503]  # Può fallire se servizi non disponibili
         
-        data = json.loads(response.data)
+        data = response.get_json()
         assert 'status' in data
 
 class TestAPIRoutes:
@@ -113,7 +139,7 @@ class TestAPIRoutes:
         assert response.status_code in [200, 500]  # Può fallire se SearchController non inizializzato
         
         if response.status_code == 200:
-            data = json.loads(response.data)
+            data = response.get_json()
             assert 'capabilities' in data
     
     def test_search_endpoint_validation(self, client):
@@ -124,13 +150,13 @@ class TestAPIRoutes:
         
         # Test con JSON vuoto
         response = client.post('/api/v1/search', 
-                             json={},
+                             data=_EMPTY_JSON,
                              content_type='application/json')
         assert response.status_code == 400
         
         # Test con query vuota
         response = client.post('/api/v1/search',
-                             json={'query': ''},
+                             data=_EMPTY_QUERY_JSON,
                              content_type='application/json')
         assert response.status_code == 400
     
@@ -140,44 +166,85 @@ class TestAPIRoutes:
         response = client.post('/api/v1/upload')
         assert response.status_code == 400
         
-        data = json.loads(response.data)
+        data = response.get_json()
         assert 'error' in data
         assert 'file' in data['error'].lower()
 
 class TestFileHandling:
     """Test per la gestione file"""
     
-    def test_upload_text_file(self, client):
+    def test_upload_text_file(self, client, tmp_path):
         """Test upload di un file di testo"""
-        # Crea un file di test temporaneo
-        test_content = "Questo è un file di test per Deep Search AI"
+        # Crea un file di test temporaneo (rimosso da pytest con tmp_path)
+        test_file = tmp_path / "test.txt"
+        test_file.write_text("Questo è un file di test per Deep Search AI", encoding='utf-8')
         
-        response = client.post('/api/v1/upload',
-                             data={
-                                 'file': (tempfile.NamedTemporaryFile(mode='w+', suffix='.txt', delete=False), test_content)
-                             },
-                             content_type='multipart/form-data')
+        with test_file.open('rb') as f:
+            response = client.post('/api/v1/upload',
+                                 data={'file': (f, test_file.name)},
+                                 content_type='multipart/form-data')
         
         # Può fallire se servizi non disponibili, ma dovrebbe gestire gracefully
         assert response.status_code in [200, 500]
     
+    @pytest.fixture
+    def small_limit_controller(self, app, tmp_path, monkeypatch):
+        """SearchController minimo con un FileService limitato a 1KB per file"""
+        file_service = FileService({'upload_folder': str(tmp_path), 'allowed_extensions': ['txt']})
+        file_service.max_file_size = 1024
+        monkeypatch.setattr(app, 'search_controller', _FileOnlyController(file_service))
+        return file_service
+    
+    def test_upload_rejected_by_request_length(self, client, small_limit_controller):
+        """Test 413 dal Content-Length della richiesta, prima del parsing del multipart"""
+        payload = b'x' * (MULTIPART_OVERHEAD + 4096)
+        
+        response = client.post('/api/v1/upload',
+                             data={'file': (io.BytesIO(payload), 'big.txt')},
+                             content_type='multipart/form-data')
+        
+        assert response.status_code == 413
+        assert 'troppo grande' in response.get_json()['error'].lower()
+    
+    def test_analyze_document_rejected_by_request_length(self, client, small_limit_controller):
+        """Test 413 su analyze-document prima del parsing del multipart"""
+        payload = b'x' * (MULTIPART_OVERHEAD + 4096)
+        
+        response = client.post('/api/v1/analyze-document',
+                             data={'document': (io.BytesIO(payload), 'big.txt')},
+                             content_type='multipart/form-data')
+        
+        assert response.status_code == 413
+        assert 'troppo grande' in response.get_json()['error'].lower()
+    
+    def test_upload_size_checked_without_part_length(self, client, small_limit_controller):
+        """Test limite per file con un multipart realistico (la parte non dichiara Content-Length)"""
+        payload = b'x' * 2048  # Oltre il limite del file ma entro il margine multipart
+        
+        response = client.post('/api/v1/upload',
+                             data={'file': (io.BytesIO(payload), 'medium.txt')},
+                             content_type='multipart/form-data')
+        
+        assert response.status_code == 400
+        assert 'troppo grande' in response.get_json()['error'].lower()
+    
     def test_analyze_image_validation(self, client):
         """Test validazione analisi immagine"""
         response = client.post('/api/v1/analyze-image')
         assert response.status_code == 400
         
-        data = json.loads(response.data)
+        data = response.get_json()
         assert 'error' in data
 
 class TestErrorHandling:
     """Test per la gestione degli errori"""
     
-    def test_404_error(self, client):
+    def test_404_error(self, raw_client):
         """Test gestione errore 404"""
-        response = client.get('/api/v1/nonexistent')
+        response = raw_client.get('/api/v1/nonexistent')
         assert response.status_code == 404
         
-        data = json.loads(response.data)
+        data = response.get_json()
         assert 'error' in data
     
     def test_405_error(self, client):
@@ -202,6 +269,24 @@ class TestConfiguration:
         response = client.options('/api/v1/health')
         # CORS headers dovrebbero essere presenti
         assert response.status_code in [200, 404]  # OPTIONS può non essere implementato
+    
+    def test_vector_client_not_opened_at_startup(self, monkeypatch):
+        """La creazione dell'app non deve aprire il client del database vettoriale"""
+        opened = []
+        
+        def record_open(self):
+            opened.append(self.provider)
+            raise RuntimeError("client vettoriale aperto durante create_app")
+        
+        monkeypatch.setenv('OPENAI_API_KEY', 'test-key')
+        monkeypatch.setattr(VectorService, '_init_chromadb', record_open)
+        monkeypatch.setattr(VectorService, '_init_milvus', record_open)
+        
+        app = create_app()
+        
+        assert app.search_controller is not None
+        assert opened == []
+        assert 'client' not in vars(app.search_controller.vector_service)
 
 class TestMockServices:
     """Test per verificare che i servizi mock funzionino"""
@@ -209,13 +294,13 @@ class TestMockServices:
     def test_search_with_mock_services(self, client):
         """Test ricerca con servizi mock"""
         response = client.post('/api/v1/search',
-                             json={'query': 'test query'},
+                             data=_TEST_QUERY_JSON,
                              content_type='application/json')
         
         # Con servizi mock, dovrebbe fallire gracefully
         assert response.status_code in [200, 500]
         
-        data = json.loads(response.data)
+        data = response.get_json()
         assert 'success' in data or 'error' in data
 
 if __name__ == '__main__':